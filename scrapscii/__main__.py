@@ -0,0 +1,5 @@
+import sys
+
+import scrapscii.cli
+
+sys.exit(scrapscii.cli.main())
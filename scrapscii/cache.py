@@ -0,0 +1,115 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import scrapscii.images
+
+# CONSTANTS ####################################################################
+
+CACHE_PATH = os.path.realpath(os.path.expanduser('~/.cache/scrapscii/images'))
+CACHE_MAX = 2**32 # bytes
+EVICT_TIME = 60 # seconds between two scans of the cache
+
+FAILURE_EXT = 'failure'
+
+# PATHS ########################################################################
+
+def hash_url(url: str) -> str:
+    # reduce the filename to a fixed size
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+def format_dir(key: str, path: str=CACHE_PATH) -> str:
+    # spread the entries over 256 subdirectories
+    return os.path.join(path, key[:2])
+
+def format_path(url: str, extension: str, path: str=CACHE_PATH) -> str:
+    __key = hash_url(url)
+    return os.path.join(format_dir(key=__key, path=path), __key + '.' + extension.strip('.').lower())
+
+# LOOKUP #######################################################################
+
+def find_entry(url: str, path: str=CACHE_PATH, extensions: list=scrapscii.images.EXTENSION_LIST + [FAILURE_EXT]) -> str:
+    __key = hash_url(url)
+    __dir = format_dir(key=__key, path=path)
+    # the extension is unknown before the download, probe the few possible ones instead of listing the directory
+    for __e in extensions:
+        __path = os.path.join(__dir, __key + '.' + __e)
+        if os.path.isfile(__path):
+            return __path
+    return ''
+
+def is_failure(entry: str) -> bool:
+    return (
+        bool(entry)
+        and os.path.splitext(entry)[-1].strip('.') == FAILURE_EXT)
+
+def read_failure(entry: str) -> str:
+    with open(entry, 'r') as __file:
+        return __file.read().strip()
+
+def touch_entry(entry: str) -> None:
+    # the modification time tracks the last use, for the LRU eviction
+    try:
+        os.utime(entry)
+    except OSError:
+        pass
+
+def remove_entry(entry: str) -> None:
+    try:
+        os.remove(entry)
+    # removed by another process
+    except OSError:
+        pass
+
+# STORE ########################################################################
+
+def export_entry(data: bytes, path: str) -> str:
+    __dir = os.path.dirname(path)
+    os.makedirs(__dir, exist_ok=True)
+    # write to a temp file and then rename, so that concurrent readers never see partial entries
+    __fd, __temp = tempfile.mkstemp(dir=__dir, suffix='.tmp')
+    with os.fdopen(__fd, 'b+w') as __file:
+        __file.write(data)
+    os.replace(__temp, path)
+    return path
+
+def store_image(url: str, data: bytes, extension: str, path: str=CACHE_PATH) -> str:
+    return export_entry(data=data, path=format_path(url=url, extension=extension, path=path))
+
+def store_failure(url: str, reason: str, path: str=CACHE_PATH) -> str:
+    # negative entry, so that dead URLs are not retried
+    return export_entry(data=reason.encode('utf-8'), path=format_path(url=url, extension=FAILURE_EXT, path=path))
+
+# EVICT ########################################################################
+
+def list_entries(path: str=CACHE_PATH) -> list:
+    __entries = []
+    for __dp, __dn, __fn in os.walk(path):
+        for __f in __fn:
+            try:
+                __stat = os.stat(os.path.join(__dp, __f))
+                __entries.append((__stat.st_mtime, __stat.st_size, os.path.join(__dp, __f)))
+            # removed by another process
+            except OSError:
+                pass
+    return __entries
+
+def should_evict(last: float, interval: float=EVICT_TIME, now: float=0.0) -> bool:
+    # a scan stats the whole cache, it is not done after every table
+    return (now or time.time()) - last >= interval
+
+def evict_entries(path: str=CACHE_PATH, budget: int=CACHE_MAX) -> int:
+    __freed = 0
+    __entries = sorted(list_entries(path=path))
+    __total = sum(__e[1] for __e in __entries)
+    # remove the least recently used entries first
+    for __time, __size, __path in __entries:
+        if __total - __freed <= budget:
+            break
+        try:
+            os.remove(__path)
+            __freed += __size
+        except OSError:
+            pass
+    return __freed
@@ -0,0 +1,51 @@
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# CONSTANTS ####################################################################
+
+# invisible at the end of a line: tabs and the unicode space separators (Zs), as a regex class
+SPACES = '\t\x0b\x0c \u00a0\u1680\u2000-\u200a\u202f\u205f\u3000'
+
+# the same patterns work with python and RE2 (arrow)
+TRAILING_RE = '[' + SPACES + ']+(\n|$)'
+LEADING_RE = '^\n+'
+ENDING_RE = '\n+$'
+
+# TEXT #########################################################################
+
+def canonicalize_text(text: str) -> str:
+    # unix line breaks
+    __text = text.replace('\r\n', '\n').replace('\r', '\n')
+    # trailing spaces on each line
+    __text = re.sub(TRAILING_RE, '\\1', __text)
+    # blank lines around the art, the leading spaces of the first line are kept
+    return re.sub(ENDING_RE, '', re.sub(LEADING_RE, '', __text))
+
+# ARROW ########################################################################
+
+def canonicalize_array(array: pa.Array) -> pa.Array:
+    # same as canonicalize_text, on a whole column at once
+    __array = pc.replace_substring(pc.replace_substring(array, pattern='\r\n', replacement='\n'), pattern='\r', replacement='\n')
+    __array = pc.replace_substring_regex(__array, pattern=TRAILING_RE, replacement='\\1')
+    __array = pc.replace_substring_regex(__array, pattern=LEADING_RE, replacement='')
+    return pc.replace_substring_regex(__array, pattern=ENDING_RE, replacement='')
+
+def canonicalize_table(table: pa.Table, column: str='content', raw: str='') -> pa.Table:
+    __index = table.schema.get_field_index(column)
+    __table = table.set_column(__index, column, canonicalize_array(table.column(column)))
+    # keep the original content losslessly, in its own column
+    if raw:
+        __table = __table.append_column(raw, table.column(column))
+    return __table
+
+# REPORT #######################################################################
+
+def measure_bytes(array: pa.Array) -> int:
+    return pc.sum(pc.binary_length(array)).as_py() or 0
+
+def report_table(table: pa.Table, column: str='content') -> dict:
+    __before = measure_bytes(table.column(column))
+    __after = measure_bytes(canonicalize_array(table.column(column)))
+    return {'rows': table.num_rows, 'before': __before, 'after': __after, 'saved': __before - __after,}
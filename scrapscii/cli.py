@@ -0,0 +1,283 @@
+import argparse
+import importlib.util
+import json
+import os
+import sys
+
+# the heavy dependencies (scrapy, pyarrow, datasets, art...) are imported in the commands that need them
+
+# META #########################################################################
+
+ROOT_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../'))
+DATA_PATH = os.path.join(ROOT_PATH, 'datasets')
+SCRIPTS_PATH = os.path.join(ROOT_PATH, 'scripts')
+
+SPIDER_LIST = ['asciiart', 'images', 'twitchquotes']
+
+# LOAD #########################################################################
+
+def load_script(name: str, path: str=SCRIPTS_PATH) -> object:
+    # the scripts are not part of the package, they are imported from the repository
+    __spec = importlib.util.spec_from_file_location('scripts.' + name, os.path.join(path, name + '.py'))
+    __module = importlib.util.module_from_spec(__spec)
+    __spec.loader.exec_module(__module)
+    return __module
+
+# COMMANDS #####################################################################
+
+def crawl(args: argparse.Namespace) -> int:
+    import scrapy.cmdline
+    # same as running "scrapy crawl" from the project directory
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'scrapscii.settings')
+    __argv = ['scrapy', 'crawl', args.spider]
+    __argv += ['-O', args.output] if args.output else []
+    __argv += [__o for __a in args.argument for __o in ('-a', __a)]
+    __argv += [__o for __s in args.setting for __o in ('-s', __s)]
+    return scrapy.cmdline.execute(argv=__argv)
+
+def convert(args: argparse.Namespace) -> int:
+    import scrapscii.index
+    __script = load_script('convert')
+    __index = None if args.keep_duplicates else scrapscii.index.load_index(path=args.index)
+    __script.cast_all(paths=args.paths or __script.list_json(), index=__index, raw=args.raw)
+    return 0
+
+def graffiti(args: argparse.Namespace) -> int:
+    __script = load_script('graffiti')
+    # compare the cached rendering with art
+    if args.verify:
+        __errors = __script.verify_fonts(fonts=sorted(__script.art.params.FONT_MAP.keys()))
+        print('\n'.join(str(__e) for __e in __errors))
+        return int(bool(__errors))
+    # generate a partition
+    # the profiler only samples this process, so the fonts are rendered here when it is on
+    __workers = 1 if args.profile else args.workers
+    __script.export_partition(index=args.index, count=args.count, workers=__workers, seed=args.seed, export_json=args.json)
+    return 0
+
+def stylize(args: argparse.Namespace) -> int:
+    __script = load_script('stylize')
+    if args.merge:
+        __script.merge_manifests()
+        return 0
+    if args.launch:
+        return max(__script.launch_workers(workers=args.workers), default=0)
+    __script.run_worker(rank=args.rank, workers=args.workers)
+    return 0
+
+def compact(args: argparse.Namespace) -> int:
+    import scrapscii.data
+    __outputs = scrapscii.data.compact_parquet(paths=scrapscii.data.list_parquet(args.input), path=args.output, rows_max=args.rows)
+    print('\n'.join(__outputs))
+    return 0
+
+def canonical(args: argparse.Namespace) -> int:
+    import scrapscii.data
+    __sources = args.sources or sorted(__d for __d in os.listdir(args.path) if os.path.isdir(os.path.join(args.path, __d)))
+    __reports = {}
+    for __s in __sources:
+        __paths = scrapscii.data.list_parquet(os.path.join(args.path, __s))
+        # rewrite the files, or only measure what would be saved
+        if args.write:
+            __reports[__s] = {'rows': 0, 'before': 0, 'after': 0, 'saved': 0,}
+            for __p in __paths:
+                for __k, __v in scrapscii.data.canonicalize_parquet(path=__p, raw=args.raw).items():
+                    __reports[__s][__k] += __v
+        else:
+            __reports[__s] = scrapscii.data.report_parquet(paths=__paths)
+    print(json.dumps(__reports, indent=1))
+    return 0
+
+def index(args: argparse.Namespace) -> int:
+    import scrapscii.data
+    import scrapscii.index
+    __index = scrapscii.index.load_index(path=args.index)
+    # point lookups
+    if args.lookup:
+        with open(args.lookup, 'r') as __file:
+            __location = scrapscii.index.lookup(index=__index, key=scrapscii.index.hash_content(__file.read()))
+        print(json.dumps(__location))
+        return int(not __location)
+    # add the existing files, and list the duplicates
+    __duplicates = scrapscii.data.index_parquet(paths=scrapscii.data.list_parquet(args.input), index=__index)
+    print('\n'.join(json.dumps(__d) for __d in __duplicates))
+    print(json.dumps({'entries': len(__index['entries']), 'duplicates': len(__duplicates)}))
+    return 0
+
+def neardup(args: argparse.Namespace) -> int:
+    import scrapscii.data
+    import scrapscii.minhash
+    __paths = scrapscii.data.list_parquet(args.input)
+    __index = scrapscii.minhash.init_index(threshold=args.threshold)
+    scrapscii.minhash.index_parquet(paths=__paths, index=__index)
+    # the first row of each cluster is its representative
+    __clusters = scrapscii.minhash.cluster(index=__index)
+    print('\n'.join(json.dumps(__c) for __c in __clusters))
+    print(json.dumps({'rows': len(__index['keys']), 'clusters': len(__clusters), 'duplicates': sum(len(__c) - 1 for __c in __clusters)}))
+    # copy the files without the other members
+    if args.output:
+        scrapscii.minhash.export_representatives(paths=__paths, clusters=__clusters, root=args.input, path=args.output)
+    return 0
+
+def pack(args: argparse.Namespace) -> int:
+    import scrapscii.data
+    # one packed buffer next to each parquet file
+    for __p in scrapscii.data.list_parquet(args.input):
+        print(__p, json.dumps(scrapscii.data.cast_parquet_to_codepoints(path=__p, grid=args.grid)))
+    return 0
+
+def stats(args: argparse.Namespace) -> int:
+    import scrapscii.data
+    # one summary per source directory
+    __sources = args.sources or sorted(__d for __d in os.listdir(args.path) if os.path.isdir(os.path.join(args.path, __d)))
+    __stats = {__s: scrapscii.data.summarize_parquet(paths=scrapscii.data.list_parquet(os.path.join(args.path, __s))) for __s in __sources}
+    print(json.dumps(__stats, indent=1))
+    return 0
+
+def benchmark(args: argparse.Namespace) -> int:
+    # nothing to compare with, before running anything
+    if args.compare and not os.path.isfile(args.baseline):
+        print('no baseline at {}, run --save first'.format(args.baseline), file=sys.stderr)
+        return 1
+    __script = load_script('benchmark')
+    __results = __script.run_all(repeat=args.repeat)
+    print(json.dumps(__results, indent=1))
+    # record the reference measures
+    if args.save:
+        __script.save_baseline(results=__results, path=args.baseline)
+    # fail when a benchmark is slower or heavier than the reference
+    if args.compare:
+        __regressions = __script.compare(results=__results, baseline=__script.load_baseline(path=args.baseline), tolerance=args.tolerance)
+        print('\n'.join(json.dumps(__r) for __r in __regressions))
+        return int(bool(__regressions))
+    return 0
+
+def loadtest(args: argparse.Namespace) -> int:
+    __script = load_script('loadtest')
+    __config = __script.init_config(latency=args.latency, mean=args.mean, sigma=args.sigma, errors=args.errors, throttled=args.throttled, items=args.items, lines=args.lines, width=args.width, seed=args.seed)
+    __settings = dict(__s.split('=', 1) for __s in args.setting)
+    __results = __script.run_loadtest(spider=args.spider, config=__config, pages=args.pages, settings=__settings)
+    print(json.dumps(__results, indent=1))
+    # keep the measures, to compare the settings later
+    if args.output:
+        with open(args.output, 'w') as __file:
+            json.dump(__results, __file, indent=1)
+    return 0
+
+# PARSER #######################################################################
+
+def build_parser() -> argparse.ArgumentParser:
+    __parser = argparse.ArgumentParser(prog='scrapscii', description='Scrape ASCII art from various sources.')
+    __parser.add_argument('--profile', default=os.environ.get('SCRAPSCII_PROFILE', ''), help='sample the stacks and write PATH.collapsed and PATH.stages.json')
+    __parser.add_argument('--profile-interval', type=float, default=float(os.environ.get('SCRAPSCII_PROFILE_INTERVAL', 0.005)), help='seconds between samples')
+    __commands = __parser.add_subparsers(dest='command', required=True)
+    # crawl
+    __crawl = __commands.add_parser('crawl', help='run one of the spiders')
+    __crawl.add_argument('spider', choices=SPIDER_LIST)
+    __crawl.add_argument('-o', '--output', default='', help='export the items to this file')
+    __crawl.add_argument('-a', '--argument', action='append', default=[], help='spider argument NAME=VALUE')
+    __crawl.add_argument('-s', '--setting', action='append', default=[], help='scrapy setting NAME=VALUE')
+    __crawl.set_defaults(func=crawl)
+    # convert
+    __convert = __commands.add_parser('convert', help='cast the JSON datasets to parquet')
+    __convert.add_argument('paths', nargs='*', help='JSON files, all the datasets by default')
+    __convert.add_argument('--index', default=os.path.join(DATA_PATH, 'contents.index'), help='hash index of the contents')
+    __convert.add_argument('--keep-duplicates', action='store_true', help='do not check the index')
+    __convert.add_argument('--raw', action='store_true', help='keep the original content in a raw column')
+    __convert.set_defaults(func=convert)
+    # graffiti
+    __graffiti = __commands.add_parser('graffiti', help='generate text in all the fonts of art')
+    __graffiti.add_argument('--index', type=int, default=0, help='partition to generate')
+    __graffiti.add_argument('--count', type=int, default=1, help='number of partitions')
+    __graffiti.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    __graffiti.add_argument('--seed', type=int, default=1337)
+    __graffiti.add_argument('--json', action='store_true', help='also export JSON')
+    __graffiti.add_argument('--verify', action='store_true', help='compare the glyph cache with art')
+    __graffiti.set_defaults(func=graffiti)
+    # stylize
+    __stylize = __commands.add_parser('stylize', help='convert DataCompDR images to ASCII art')
+    __stylize.add_argument('--rank', type=int, default=int(os.environ.get('RANK', 0)))
+    __stylize.add_argument('--workers', type=int, default=int(os.environ.get('WORLD_SIZE', 1)))
+    __stylize.add_argument('--launch', action='store_true', help='start all the workers on this machine')
+    __stylize.add_argument('--merge', action='store_true', help='write the manifest of all the workers')
+    __stylize.set_defaults(func=stylize)
+    # compact
+    __compact = __commands.add_parser('compact', help='merge small parquet shards')
+    __compact.add_argument('input', help='directory of the shards')
+    __compact.add_argument('output', help='directory of the merged files')
+    __compact.add_argument('--rows', type=int, default=2**16, help='rows per output file')
+    __compact.set_defaults(func=compact)
+    # canonical
+    __canonical = __commands.add_parser('canonical', help='strip the invisible whitespace of the contents')
+    __canonical.add_argument('sources', nargs='*', help='subdirectories, all by default')
+    __canonical.add_argument('--path', default=DATA_PATH)
+    __canonical.add_argument('--write', action='store_true', help='rewrite the files, otherwise only report the bytes saved')
+    __canonical.add_argument('--raw', action='store_true', help='keep the original content in a raw column')
+    __canonical.set_defaults(func=canonical)
+    # index
+    __index = __commands.add_parser('index', help='index the contents by hash')
+    __index.add_argument('input', nargs='?', default=DATA_PATH, help='directory of the parquet files')
+    __index.add_argument('--index', default=os.path.join(DATA_PATH, 'contents.index'), help='hash index of the contents')
+    __index.add_argument('--lookup', default='', help='find the row matching the content of this file')
+    __index.set_defaults(func=index)
+    # neardup
+    __neardup = __commands.add_parser('neardup', help='cluster the near duplicate contents')
+    __neardup.add_argument('input', nargs='?', default=DATA_PATH, help='directory of the parquet files')
+    __neardup.add_argument('--threshold', type=float, default=0.8, help='estimated Jaccard similarity')
+    __neardup.add_argument('--output', default='', help='write the files with one row per cluster to this directory')
+    __neardup.set_defaults(func=neardup)
+    # pack
+    __pack = __commands.add_parser('pack', help='export the contents as packed codepoint arrays')
+    __pack.add_argument('input', help='directory of the parquet files')
+    __pack.add_argument('--grid', action='store_true', help='pad the samples to rectangular grids')
+    __pack.set_defaults(func=pack)
+    # stats
+    __stats = __commands.add_parser('stats', help='summarize the parquet datasets')
+    __stats.add_argument('sources', nargs='*', help='subdirectories, all by default')
+    __stats.add_argument('--path', default=DATA_PATH)
+    __stats.set_defaults(func=stats)
+    # benchmark
+    __benchmark = __commands.add_parser('benchmark', help='measure the pipeline on the local fixtures')
+    __benchmark.add_argument('--repeat', type=int, default=5, help='runs per benchmark, the fastest is kept')
+    __benchmark.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    __benchmark.add_argument('--compare', action='store_true', help='flag the regressions against the baseline')
+    __benchmark.add_argument('--tolerance', type=float, default=0.25, help='relative degradation allowed')
+    __benchmark.add_argument('--baseline', default=os.path.join(SCRIPTS_PATH, 'fixtures', 'baseline.json'))
+    __benchmark.set_defaults(func=benchmark)
+    # loadtest
+    __loadtest = __commands.add_parser('loadtest', help='run a spider against a local stand-in of its site')
+    __loadtest.add_argument('spider', choices=['asciiart', 'twitchquotes'])
+    __loadtest.add_argument('--latency', choices=['constant', 'uniform', 'exponential', 'lognormal'], default='exponential', help='distribution of the response delays')
+    __loadtest.add_argument('--mean', type=float, default=0.1, help='mean latency in seconds')
+    __loadtest.add_argument('--sigma', type=float, default=0.5, help='spread of the lognormal latency')
+    __loadtest.add_argument('--errors', type=float, default=0., help='share of 500 responses')
+    __loadtest.add_argument('--throttled', type=float, default=0., help='share of 429 responses')
+    __loadtest.add_argument('--items', type=int, default=16, help='arts per page')
+    __loadtest.add_argument('--lines', type=int, default=16, help='maximum lines per art')
+    __loadtest.add_argument('--width', type=int, default=64, help='maximum characters per line')
+    __loadtest.add_argument('--seed', type=int, default=1337)
+    __loadtest.add_argument('--pages', type=int, default=0, help='stop after this many responses, 0 for all the URLs')
+    __loadtest.add_argument('-s', '--setting', action='append', default=[], help='scrapy setting NAME=VALUE')
+    __loadtest.add_argument('-o', '--output', default='', help='save the report to this JSON file')
+    __loadtest.set_defaults(func=loadtest)
+    return __parser
+
+# MAIN #########################################################################
+
+def main(argv: list=None) -> int:
+    __args = build_parser().parse_args(argv)
+    # the crawl is profiled by the scrapy extension, between the spider signals
+    if __args.command == 'crawl' and __args.profile:
+        __args.setting += ['PROFILE_PATH=' + __args.profile, 'PROFILE_INTERVAL={}'.format(__args.profile_interval)]
+        return __args.func(__args) or 0
+    # the workers spawned by the commands profile themselves
+    if __args.profile:
+        os.environ['SCRAPSCII_PROFILE'] = __args.profile
+        os.environ['SCRAPSCII_PROFILE_INTERVAL'] = str(__args.profile_interval)
+    # standard library only, still light
+    import scrapscii.profiler
+    with scrapscii.profiler.profile(path=__args.profile, interval=__args.profile_interval):
+        return __args.func(__args) or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,19 @@
+import array
+import itertools
 import json
+import mmap
 import os
+import random
+import sys
 
 import pyarrow as pa
 import pyarrow.compute as pc
 import pyarrow.lib as pl
 import pyarrow.parquet as pq
 
+import scrapscii.canonical
+import scrapscii.index
+
 # SCHEMA ######################################################################
 
 SCHEMA = pa.schema([
@@ -15,22 +23,321 @@ SCHEMA = pa.schema([
     pl.field('charsets', pa.string()),
     pl.field('chartypes', pa.string()),])
 
+RAW_FIELD = pl.field('raw', pa.string()) # the content before canonicalization
+
 # EXPORT #######################################################################
 
-def export_table_as_parquet(table: iter, path: str, schema: pl.Schema=SCHEMA) -> None:
+def export_table_as_parquet(table: iter, path: str, schema: pl.Schema=SCHEMA, index: dict=None, canonical: bool=True, raw: bool=False) -> None:
+    __temp = path + '.tmp'
+    __table = table
+    # drop the exact duplicates of the indexed rows
+    if index is not None:
+        scrapscii.index.remove_file(index=index, path=path)
+        __table, __keys = deduplicate_table(table=table, index=index)
+    __table = pl.Table.from_pylist(mapping=__table, schema=schema)
+    # strip the invisible whitespace, on the whole column at once
+    if canonical:
+        __table = scrapscii.canonical.canonicalize_table(table=__table, column='content', raw=RAW_FIELD.name if raw else '')
+    # write to a temp file first, so that readers never see partial shards
     pq.write_table(
-        table=pl.Table.from_pylist(
-            mapping=table,
-            schema=schema),
-        where=path)
+        table=__table,
+        where=__temp)
+    # atomic on POSIX
+    os.replace(__temp, path)
+    # record the location of the new rows
+    if index is not None:
+        scrapscii.index.insert(index=index, entries=[(__k, path, __g, __r) for __k, (__g, __r) in zip(__keys, locate_rows(path=path))])
+
+# INDEX ########################################################################
+
+def deduplicate_table(table: iter, index: dict, column: str='content') -> tuple:
+    __rows, __keys = [], {}
+    for __r in table:
+        __k = scrapscii.index.hash_content(__r[column] or '')
+        # already in the corpus or earlier in the same table
+        if not scrapscii.index.contains(index=index, key=__k) and __k not in __keys:
+            __rows.append(__r)
+            __keys[__k] = None
+    return (__rows, list(__keys))
+
+def locate_rows(path: str) -> list:
+    __meta = pq.ParquetFile(path).metadata
+    # (row group, row) of each row in the file
+    return [(__g, __r) for __g in range(__meta.num_row_groups) for __r in range(__meta.row_group(__g).num_rows)]
+
+def index_parquet(paths: list, index: dict, column: str='content') -> list:
+    __duplicates = []
+    # one pass over the existing files, to initialize the index
+    for __p in paths:
+        __file = pq.ParquetFile(__p)
+        __entries = {}
+        for __g in range(__file.metadata.num_row_groups):
+            for __r, __c in enumerate(__file.read_row_group(__g, columns=[column]).column(column).to_pylist()):
+                __k = scrapscii.index.hash_content(__c or '')
+                __l = scrapscii.index.lookup(index=index, key=__k) or __entries.get(__k, ())
+                # keep the first occurrence
+                if __l:
+                    __duplicates.append(((__p, __g, __r), __l))
+                else:
+                    __entries[__k] = (__p, __g, __r)
+        scrapscii.index.insert(index=index, entries=[(__k,) + __l for __k, __l in __entries.items()])
+    return __duplicates
 
 # CONVERT ######################################################################
 
-def cast_json_to_parquet(path: str, schema: pl.Schema=SCHEMA) -> None:
+def cast_json_to_parquet(path: str, schema: pl.Schema=SCHEMA, index: dict=None, raw: bool=False) -> None:
     # change the extension
     __path = os.path.splitext(path)[0] + '.parquet'
     # import the JSON data
     with open(path, 'r') as __file:
         __data = json.load(__file)
     # export as parquet
-    export_table_as_parquet(table=__data, path=__path, schema=schema)
+    export_table_as_parquet(table=__data, path=__path, schema=schema, index=index, raw=raw)
+
+# CANONICALIZE ################################################################
+
+def canonicalize_parquet(path: str, raw: bool=False) -> dict:
+    __table = pq.read_table(path)
+    __report = scrapscii.canonical.report_table(table=__table, column='content')
+    # the original content may already be saved from a previous pass
+    __raw = RAW_FIELD.name if raw and RAW_FIELD.name not in __table.column_names else ''
+    __table = scrapscii.canonical.canonicalize_table(table=__table, column='content', raw=__raw)
+    # rewrite in place, atomically
+    pq.write_table(table=__table, where=path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return __report
+
+def report_parquet(paths: list) -> dict:
+    __report = {'rows': 0, 'before': 0, 'after': 0, 'saved': 0,}
+    # only the content column is read
+    for __p in paths:
+        for __k, __v in scrapscii.canonical.report_table(table=pq.read_table(__p, columns=['content']), column='content').items():
+            __report[__k] += __v
+    return __report
+
+# COMPACT ######################################################################
+
+ROWS_MAX = 2**16
+
+def compact_parquet(paths: list, path: str, rows_max: int=ROWS_MAX, schema: pl.Schema=None) -> list:
+    __outputs = []
+    __writer = None
+    __rows = 0
+    os.makedirs(path, exist_ok=True)
+    # stream the small shards into larger files, batch by batch
+    for __p in paths:
+        for __batch in pq.ParquetFile(__p).iter_batches():
+            # start a new file
+            if __writer is None or __rows >= rows_max:
+                if __writer is not None:
+                    __writer.close()
+                    os.replace(__outputs[-1] + '.tmp', __outputs[-1])
+                __outputs.append(os.path.join(path, '{index:0>4d}.parquet'.format(index=len(__outputs))))
+                # the schema of the shards by default, with or without the raw column
+                __writer = pq.ParquetWriter(__outputs[-1] + '.tmp', schema=schema or __batch.schema)
+                __rows = 0
+            __writer.write_batch(__batch)
+            __rows += __batch.num_rows
+    # last file
+    if __writer is not None:
+        __writer.close()
+        os.replace(__outputs[-1] + '.tmp', __outputs[-1])
+    return __outputs
+
+# STATS ########################################################################
+
+def summarize_parquet(paths: list) -> dict:
+    __summary = {'files': 0, 'rows': 0, 'groups': 0, 'bytes': 0, 'raw': 0,}
+    # only the footers are read
+    for __p in paths:
+        __meta = pq.ParquetFile(__p).metadata
+        __summary['files'] += 1
+        __summary['rows'] += __meta.num_rows
+        __summary['groups'] += __meta.num_row_groups
+        __summary['bytes'] += os.path.getsize(__p)
+        __summary['raw'] += sum(__meta.row_group(__i).total_byte_size for __i in range(__meta.num_row_groups))
+    return __summary
+
+# PACK #########################################################################
+
+PAD = ' '
+
+CODEPOINT_DICT = {
+    'uint16': ('utf-16-le', 'H'),
+    'uint32': ('utf-32-le', 'I'),}
+
+def pad_grid(text: str, pad: str=PAD) -> tuple:
+    # rectangular block, without the line breaks
+    __lines = text.rstrip('\n').split('\n')
+    __width = max(len(__l) for __l in __lines)
+    return (''.join(__l.ljust(__width, pad) for __l in __lines), len(__lines), __width)
+
+def encode_codepoints(texts: list) -> tuple:
+    # surrogatepass keeps one code unit per character, even for the lone surrogates
+    __data = [__t.encode('utf-16-le', errors='surrogatepass') for __t in texts]
+    # two bytes per codepoint, unless there are characters beyond the BMP
+    if all(len(__d) == 2 * len(__t) for __d, __t in zip(__data, texts)):
+        return ('uint16', __data)
+    return ('uint32', [__t.encode('utf-32-le', errors='surrogatepass') for __t in texts])
+
+def export_buffer(data: bytes, path: str) -> None:
+    with open(path + '.tmp', 'wb') as __file:
+        __file.write(data)
+    os.replace(path + '.tmp', path)
+
+def export_array(values: list, typecode: str, path: str) -> None:
+    __array = array.array(typecode, values)
+    # the buffers are always little endian
+    if sys.byteorder != 'little':
+        __array.byteswap()
+    export_buffer(data=__array.tobytes(), path=path)
+
+def export_table_as_codepoints(table: iter, path: str, column: str='content', grid: bool=False, pad: str=PAD) -> dict:
+    __texts = [__r[column] or '' for __r in table]
+    __shapes = []
+    # fixed width rows, so that the samples can be reshaped as 2D arrays
+    if grid:
+        __grids = [pad_grid(text=__t, pad=pad) for __t in __texts]
+        __texts = [__g[0] for __g in __grids]
+        __shapes = [__d for __g in __grids for __d in __g[1:]]
+    __dtype, __data = encode_codepoints(texts=__texts)
+    # the sample i spans the codepoints offsets[i]:offsets[i + 1]
+    __offsets = list(itertools.accumulate((len(__t) for __t in __texts), initial=0))
+    __meta = {'dtype': __dtype, 'count': len(__texts), 'length': __offsets[-1], 'grid': grid, 'pad': pad if grid else '',}
+    # all the codepoints in a single contiguous buffer
+    export_buffer(data=b''.join(__data), path=path + '.bin')
+    export_array(values=__offsets, typecode='Q', path=path + '.idx')
+    # (height, width) of each sample
+    if grid:
+        export_array(values=__shapes, typecode='I', path=path + '.shape')
+    # written last, it marks the export as complete
+    export_buffer(data=json.dumps(__meta, indent=1).encode('utf-8'), path=path + '.meta')
+    return __meta
+
+def cast_parquet_to_codepoints(path: str, column: str='content', grid: bool=False, pad: str=PAD) -> dict:
+    # only the text column is read
+    __table = pq.read_table(path, columns=[column]).to_pylist()
+    return export_table_as_codepoints(table=__table, path=os.path.splitext(path)[0], column=column, grid=grid, pad=pad)
+
+# LOAD #########################################################################
+
+def map_buffer(path: str, typecode: str) -> memoryview:
+    # mmap cannot map empty files
+    if not os.path.getsize(path):
+        return memoryview(b'').cast(typecode)
+    with open(path, 'rb') as __file:
+        # the mapping stays open as long as the view is referenced
+        return memoryview(mmap.mmap(__file.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+def load_codepoints(path: str) -> dict:
+    with open(path + '.meta', 'r') as __file:
+        __meta = json.load(__file)
+    return {
+        'meta': __meta,
+        'data': map_buffer(path=path + '.bin', typecode=CODEPOINT_DICT[__meta['dtype']][-1]),
+        'offsets': map_buffer(path=path + '.idx', typecode='Q'),
+        'shapes': map_buffer(path=path + '.shape', typecode='I') if __meta['grid'] else None,}
+
+def slice_codepoints(packed: dict, index: int) -> memoryview:
+    # zero copy
+    return packed['data'][packed['offsets'][index]:packed['offsets'][index + 1]]
+
+def shape_codepoints(packed: dict, index: int) -> tuple:
+    return tuple(packed['shapes'][2 * index:2 * index + 2]) if packed['shapes'] is not None else (packed['offsets'][index + 1] - packed['offsets'][index],)
+
+def decode_codepoints(packed: dict, index: int) -> str:
+    # back to a string, mostly for checking
+    return slice_codepoints(packed=packed, index=index).tobytes().decode(CODEPOINT_DICT[packed['meta']['dtype']][0], errors='surrogatepass')
+
+# STREAM #######################################################################
+
+DATA_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets'))
+SOURCE_LIST = ['asciiart', 'copypasta', 'graffiti', 'images']
+
+BUFFER_LEN = 2**12 # rows
+BATCH_LEN = 2**8 # rows
+SEED = 1337
+
+def list_parquet(path: str) -> list:
+    return sorted(
+        os.path.join(__dp, __f)
+        for __dp, __dn, __fn in os.walk(path)
+        for __f in __fn if __f.endswith('.parquet'))
+
+def list_fragments(paths: list, rng: random.Random) -> list:
+    __fragments = []
+    # shuffle the files, then the row groups inside each file
+    for __p in rng.sample(paths, len(paths)):
+        __groups = list(range(pq.ParquetFile(__p).metadata.num_row_groups))
+        rng.shuffle(__groups)
+        __fragments.extend((__p, __g) for __g in __groups)
+    return __fragments
+
+def iter_fragments(fragments: list, shard: int=0, shards: int=1, columns: list=None) -> iter:
+    # whole row groups per shard, as long as there are enough of them
+    if len(fragments) >= shards:
+        for __p, __g in fragments[shard::shards]:
+            yield from pq.ParquetFile(__p).read_row_group(__g, columns=columns).to_pylist()
+    # otherwise every shard reads everything and keeps one row out of shards
+    else:
+        __rows = (__r for __p, __g in fragments for __r in pq.ParquetFile(__p).read_row_group(__g, columns=columns).to_pylist())
+        yield from itertools.islice(__rows, shard, None, shards)
+
+def shuffle_rows(rows: iter, rng: random.Random, buffer_len: int=BUFFER_LEN) -> iter:
+    __buffer = []
+    # swap each incoming row with a random row of the buffer, memory stays bounded
+    for __r in rows:
+        if len(__buffer) < buffer_len:
+            __buffer.append(__r)
+            continue
+        __i = rng.randrange(buffer_len)
+        yield __buffer[__i]
+        __buffer[__i] = __r
+    # flush
+    rng.shuffle(__buffer)
+    yield from __buffer
+
+def stream_source(path: str, seed: int=SEED, epoch: int=0, rank: int=0, ranks: int=1, worker: int=0, workers: int=1, buffer_len: int=BUFFER_LEN, columns: list=None) -> iter:
+    __shard, __shards = rank * workers + worker, ranks * workers
+    # all the shards must agree on the order of the fragments
+    __fragments = list_fragments(paths=list_parquet(path), rng=random.Random('{seed}/{epoch}/{path}'.format(seed=seed, epoch=epoch, path=os.path.basename(path))))
+    # the rows are shuffled independently on each shard
+    __rng = random.Random('{seed}/{epoch}/{path}/{shard}'.format(seed=seed, epoch=epoch, path=os.path.basename(path), shard=__shard))
+    return shuffle_rows(rows=iter_fragments(fragments=__fragments, shard=__shard, shards=__shards, columns=columns), rng=__rng, buffer_len=buffer_len)
+
+def mix_sources(streams: dict, weights: dict, rng: random.Random) -> iter:
+    __streams = dict(streams)
+    # draw the source of each row, until all of them are exhausted
+    while __streams:
+        __names = list(__streams.keys())
+        __name = rng.choices(__names, weights=[weights.get(__n, 1.) for __n in __names])[0]
+        try:
+            yield next(__streams[__name])
+        # the remaining sources keep their relative weights
+        except StopIteration:
+            del __streams[__name]
+
+def stream_dataset(
+    sources: list=SOURCE_LIST,
+    weights: dict={},
+    path: str=DATA_PATH,
+    seed: int=SEED,
+    epoch: int=0,
+    rank: int=0,
+    ranks: int=1,
+    worker: int=0,
+    workers: int=1,
+    buffer_len: int=BUFFER_LEN,
+    columns: list=None,
+) -> iter:
+    # sampled with equal weights by default, whatever the size of each source
+    __streams = {
+        __s: stream_source(path=os.path.join(path, __s), seed=seed, epoch=epoch, rank=rank, ranks=ranks, worker=worker, workers=workers, buffer_len=buffer_len, columns=columns)
+        for __s in sources}
+    return mix_sources(streams=__streams, weights=weights, rng=random.Random('{seed}/{epoch}/{shard}'.format(seed=seed, epoch=epoch, shard=rank * workers + worker)))
+
+def stream_batches(rows: iter, batch_len: int=BATCH_LEN, schema: pl.Schema=SCHEMA) -> iter:
+    __rows = iter(rows)
+    # group the rows into record batches
+    while __batch := list(itertools.islice(__rows, batch_len)):
+        yield pa.RecordBatch.from_pylist(__batch, schema=schema)
@@ -0,0 +1,31 @@
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+import scrapscii.profiler
+
+# PROFILER #####################################################################
+
+class ProfilerExtension:
+    def __init__(self, path: str, interval: float):
+        self._path = path
+        self._interval = interval
+        self._profiler = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # opt-in, per run: scrapy crawl asciiart -s PROFILE_PATH=profiles/asciiart
+        if not crawler.settings.get('PROFILE_PATH'):
+            raise NotConfigured
+        __extension = cls(path=crawler.settings.get('PROFILE_PATH'), interval=crawler.settings.getfloat('PROFILE_INTERVAL', scrapscii.profiler.INTERVAL))
+        crawler.signals.connect(__extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(__extension.spider_closed, signal=signals.spider_closed)
+        return __extension
+
+    def spider_opened(self, spider):
+        self._profiler = scrapscii.profiler.start(path=self._path, interval=self._interval)
+        spider.logger.info('Profiling to %s.collapsed' % self._path)
+
+    def spider_closed(self, spider):
+        if self._profiler is not None:
+            scrapscii.profiler.stop(self._profiler)
+            self._profiler = None
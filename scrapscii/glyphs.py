@@ -0,0 +1,87 @@
+import art
+import art.params
+import art.utils
+
+# CONSTANTS ####################################################################
+
+MIRROR_FONTS = ['mirror', 'mirror_flip']
+RANDOM_NAMES = ['random', 'rand', 'rnd']
+
+# CACHE ########################################################################
+
+GLYPH_CACHE = {}
+DECORATION_CACHE = {}
+
+def load_glyphs(font: str, cache: dict=GLYPH_CACHE) -> dict:
+    if font not in cache:
+        # split each character block into its rows, once per font
+        cache[font] = {
+            __c: tuple(__g.split('\n'))
+            for __c, __g in art.params.FONT_MAP[font][0].items()
+            # tabs and empty glyphs are skipped by art
+            if __g and ord(__c) != 9}
+    return cache[font]
+
+def load_decoration(decoration: str, cache: dict=DECORATION_CACHE) -> tuple:
+    # the random decorations must be drawn each time
+    if decoration.lower() in RANDOM_NAMES:
+        return tuple(art.decor(decoration, both=True))
+    # the name resolution computes edit distances to all the decorations
+    if decoration not in cache:
+        cache[decoration] = tuple(art.decor(decoration, both=True))
+    return cache[decoration]
+
+# RENDER #######################################################################
+
+def render_word(word: str, glyphs: dict, next_word: bool, mirror: bool=False, sep: str='\n') -> str:
+    if not word and next_word:
+        return sep
+    # the unsupported characters are ignored
+    __blocks = [glyphs[__c] for __c in word if __c in glyphs]
+    if mirror:
+        __blocks.reverse()
+    if not __blocks:
+        return ''
+    # concatenate the blocks row by row
+    __result = sep.join(''.join(__b[__i] for __b in __blocks) for __i in range(len(__blocks[0])))
+    if __result[-1] != '\n' and next_word:
+        __result += sep
+    return __result
+
+def text2art(text: str, font: str=art.DEFAULT_FONT, decoration: str=None, sep: str='\n', space: int=0) -> str:
+    # same output as art.text2art with chr_ignore=True, for the named fonts
+    __font = font.lower()
+    # the letters are drawn from random fonts in the mix mode
+    if __font == 'mix':
+        return art.text2art(text, font=font, decoration=decoration, sep=sep, space=space, chr_ignore=True)
+    if __font not in art.params.FONT_MAP:
+        __font = art.utils.indirect_font(__font, text)
+    __glyphs = load_glyphs(font=__font)
+    # spacing and case
+    __text = (' ' * space).join(text)
+    if art.params.FONT_MAP[__font][1]:
+        __text = __text.lower()
+    if __font in art.params.UPPERCASE_FONTS:
+        __text = __text.upper()
+    # render line by line
+    __words = __text.split('\n')
+    __result = ''.join(
+        render_word(word=__w, glyphs=__glyphs, next_word=__i < len(__words) - 1, mirror=__font in MIRROR_FONTS, sep=sep)
+        for __i, __w in enumerate(__words))
+    # decorate
+    if decoration is not None:
+        __left, __right = load_decoration(decoration)
+        __result = __left + __result + __right
+    return __result
+
+# VERIFY #######################################################################
+
+def verify_font(font: str, texts: list, decorations: list=[None], spacings: list=[0]) -> list:
+    __errors = []
+    # compare with the reference implementation
+    for __t in texts:
+        for __d in decorations:
+            for __s in spacings:
+                if text2art(__t, font=font, decoration=__d, space=__s) != art.text2art(__t, font=font, decoration=__d, space=__s, chr_ignore=True):
+                    __errors.append((__t, font, __d, __s))
+    return __errors
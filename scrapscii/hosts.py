@@ -0,0 +1,91 @@
+import time
+import urllib.parse
+
+# CONSTANTS ####################################################################
+
+TIMEOUT_MIN = 0.05 # seconds
+TIMEOUT_MAX = 1.0 # seconds
+
+SMOOTHING = 0.125 # weight of the latest latency, like the TCP RTT estimator
+DEVIATION = 4 # margin above the average latency, in mean deviations
+
+FAILURE_MAX = 4 # consecutive failures before the circuit opens
+COOLDOWN_TIME = 600 # seconds before a host is tried again
+
+HOST_MAX = 2**16 # least recently seen hosts are forgotten beyond
+
+# PARSE ########################################################################
+
+def parse_host(url: str) -> str:
+    try:
+        return (urllib.parse.urlparse(url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+# INIT #########################################################################
+
+def init_host() -> dict:
+    return {
+        'latency': 0.0, # smoothed
+        'deviation': 0.0, # smoothed mean deviation
+        'samples': 0,
+        'failures': 0, # consecutive
+        'opened': 0.0, # time the circuit opened, 0 while closed
+        'errors': {},} # count by class
+
+def get_host(hosts: dict, host: str, capacity: int=HOST_MAX) -> dict:
+    # move the host to the end, so that the first one is the least recently seen
+    __host = hosts.pop(host, None) or init_host()
+    hosts[host] = __host
+    # bound the memory usage
+    if len(hosts) > capacity:
+        del hosts[next(iter(hosts))]
+    return __host
+
+# CIRCUIT ######################################################################
+
+def is_available(hosts: dict, host: str, cooldown: float=COOLDOWN_TIME, now: float=0.0) -> bool:
+    __host = hosts.get(host)
+    return (
+        __host is None
+        or not __host['opened']
+        # half open: let a request through once the cooldown is over
+        or (now or time.time()) - __host['opened'] >= cooldown)
+
+# TIMEOUT ######################################################################
+
+def compute_timeout(hosts: dict, host: str, default: float=TIMEOUT_MAX, lower: float=TIMEOUT_MIN, upper: float=TIMEOUT_MAX, deviation: float=DEVIATION) -> float:
+    __host = hosts.get(host)
+    # no data yet
+    if __host is None or not __host['samples']:
+        return default
+    # the usual latency of the host plus a margin, within bounds
+    return min(upper, max(lower, __host['latency'] + deviation * __host['deviation']))
+
+# RECORD #######################################################################
+
+def record_success(hosts: dict, host: str, latency: float, smoothing: float=SMOOTHING) -> None:
+    __host = get_host(hosts, host=host)
+    # first measure
+    if not __host['samples']:
+        __host['latency'] = latency
+        __host['deviation'] = latency / 2
+    # exponentially weighted averages
+    else:
+        __host['deviation'] += smoothing * (abs(latency - __host['latency']) - __host['deviation'])
+        __host['latency'] += smoothing * (latency - __host['latency'])
+    __host['samples'] += 1
+    # close the circuit
+    __host['failures'] = 0
+    __host['opened'] = 0.0
+
+def record_failure(hosts: dict, host: str, error: str, limit: int=FAILURE_MAX, now: float=0.0) -> bool:
+    __host = get_host(hosts, host=host)
+    __host['errors'][error] = __host['errors'].get(error, 0) + 1
+    __host['failures'] += 1
+    # open the circuit, or restart the cooldown after a failed trial
+    if __host['failures'] >= limit:
+        __opened = not __host['opened']
+        __host['opened'] = now or time.time()
+        return __opened
+    return False
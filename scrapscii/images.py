@@ -0,0 +1,135 @@
+import hashlib
+import itertools
+import random
+import subprocess
+
+# CONSTANTS ####################################################################
+
+TIME_MAX = 0.1 # seconds
+
+SIZE_MAX = 2**23 # bytes
+HEAD_LEN = 16 # bytes
+
+WIDTH_MIN = 16
+WIDTH_MAX = 128
+
+VARIANT_LEN = 4
+
+# FILTER BY EXT ################################################################
+
+EXTENSION_LIST = ['jpeg', 'jpg', 'png', 'bmp', 'webp', 'tiff', 'tif', 'gif']
+
+# FILTER BY CONTENT ############################################################
+
+MAGIC_DICT = {
+    b'\xff\xd8\xff': 'jpg',
+    b'\x89PNG\r\n\x1a\n': 'png',
+    b'GIF87a': 'gif',
+    b'GIF89a': 'gif',
+    b'BM': 'bmp',
+    b'II*\x00': 'tiff',
+    b'MM\x00*': 'tiff',}
+
+TYPE_LIST = ['', 'application/octet-stream', 'binary/octet-stream'] # not specific enough to reject
+
+# CHECK ########################################################################
+
+CORRUPTED_HASH = ['4dcb57651a75abfd07fb36c70c6c5108c49bdb34']
+
+def is_valid_extension(extension: str, accepted: list=EXTENSION_LIST) -> bool:
+    return (
+        bool(extension)
+        and type(extension) == str
+        and extension.lower().strip('.') in accepted)
+
+def is_valid_type(mimetype: str, accepted: list=TYPE_LIST) -> bool:
+    __type = mimetype.split(';')[0].strip().lower()
+    return (
+        __type.startswith('image/')
+        or __type in accepted)
+
+def is_valid_length(length: str, size: int=SIZE_MAX) -> bool:
+    return (
+        not length
+        or not length.isdigit()
+        or int(length) <= size)
+
+def is_valid_image(image: bytes) -> bool:
+    return (
+        bool(image)
+        and type(image) == bytes
+        and not hashlib.sha1(image).hexdigest() in CORRUPTED_HASH)
+
+def is_valid_ascii(ascii: str, width: int=WIDTH_MIN) -> bool:
+    return (
+        bool(ascii)
+        and type(ascii) == str
+        and len(ascii) >= width
+        and not 'error' in ascii.lower())
+
+# PARSE ########################################################################
+
+def parse_magic(head: bytes, magic: dict=MAGIC_DICT) -> str:
+    # the WEBP signature has a variable size field in the middle
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for __m, __e in magic.items():
+        if head.startswith(__m):
+            return __e
+    return ''
+
+# RANDOM #######################################################################
+
+def random_options(width_min: int=WIDTH_MIN, width_max: int=WIDTH_MAX, width: int=0, braille: bool=None) -> list:
+    # choose the config randomly, unless forced by the caller
+    __width = '--width {width}'.format(width=width or random.randint(width_min, width_max))
+    __braille = '--braille' if (random.choice([True, False]) if braille is None else braille) else ''
+    __color = '--color' if random.choice([True] + 9 * [False]) else ''
+    __complex = '--complex' if random.choice([True, False]) else ''
+    __dither = '--dither' if __braille and random.choice([True, False]) else ''
+    __grayscale = '--grayscale' if random.choice([True] + 9 * [False]) else ''
+    __negative = '--negative' if random.choice([True] + 9 * [False]) else ''
+    __threshold = '--threshold {threshold}'.format(threshold=random.randint(96, 160)) if __braille and random.choice([True] + 4 * [False]) else ''
+    # chain all the options
+    return [__width, __braille, __color, __complex, __dither, __grayscale, __negative, __threshold]
+
+def random_variants(count: int=VARIANT_LEN, width_min: int=WIDTH_MIN, width_max: int=WIDTH_MAX) -> list:
+    # spread the widths evenly over the range, with a random offset
+    __step = (width_max - width_min + 1) / max(1, count)
+    __offset = random.random()
+    __widths = [min(width_max, width_min + int(__step * (__i + __offset))) for __i in range(count)]
+    # alternate between ascii and braille, starting randomly
+    __start = random.randint(0, 1)
+    __braille = [bool((__start + __i) % 2) for __i in range(count)]
+    # the other options are still drawn independently for each variant
+    __variants = [random_options(width_min=width_min, width_max=width_max, width=__w, braille=__b) for __w, __b in zip(__widths, __braille)]
+    # remove the duplicates (narrow width ranges)
+    return [list(__v) for __v in dict.fromkeys(tuple(__v) for __v in __variants)]
+
+def random_captions(captions: list, count: int=VARIANT_LEN) -> list:
+    # draw without replacement while possible, the variants share the same pool
+    __pool = list(captions)
+    __captions = []
+    while len(__captions) < count and __pool:
+        __captions.extend(random.sample(__pool, min(len(__pool), count - len(__captions))))
+    return __captions
+
+def format_args(options: list) -> list:
+    return list(itertools.chain.from_iterable(__o.split(' ') for __o in options if __o))
+
+def format_labels(options: list) -> list:
+    return [__o.strip('--') for __o in options if __o]
+
+# CONVERT ######################################################################
+
+def convert_image(path: str, options: list, timeout: int=TIME_MAX) -> str:
+    __ascii = ''
+    # run binary tool
+    try:
+        __process = subprocess.run(['ascii-image-converter'] + options + [path], stdout=subprocess.PIPE, timeout=timeout)
+        __ascii = __process.stdout.decode('utf-8')
+    # timeout longer executions
+    except:
+        __ascii = ''
+    # default
+    return __ascii
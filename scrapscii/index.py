@@ -0,0 +1,89 @@
+import hashlib
+import os
+import unicodedata
+
+import scrapscii.canonical
+
+# CONSTANTS ####################################################################
+
+DIGEST_LEN = 16 # bytes, collisions are negligible up to billions of rows
+
+# NORMALIZE ####################################################################
+
+def normalize_content(text: str) -> str:
+    # same glyphs, then the same layout as the exported contents
+    return scrapscii.canonical.canonicalize_text(unicodedata.normalize('NFC', text))
+
+def hash_content(text: str, digest: int=DIGEST_LEN) -> str:
+    return hashlib.blake2b(normalize_content(text).encode('utf-8', errors='surrogatepass'), digest_size=digest).hexdigest()
+
+# INIT #########################################################################
+
+def init_index(path: str='') -> dict:
+    return {
+        'path': path, # the entries are not persisted without a path
+        'entries': {},} # hash => (file, row group, row)
+
+def load_index(path: str) -> dict:
+    __index = init_index(path=path)
+    if os.path.isfile(path):
+        with open(path, 'r') as __file:
+            for __line in __file:
+                __fields = __line.rstrip('\n').split('\t')
+                # ignore a line truncated by a crash
+                if len(__fields) == 4 and __fields[-1].isdigit():
+                    __index['entries'][__fields[0]] = (resolve_path(index=__index, path=__fields[1]), int(__fields[2]), int(__fields[3]))
+    return __index
+
+# PATHS ########################################################################
+
+def resolve_path(index: dict, path: str) -> str:
+    # the files are stored relative to the index, so that the datasets can be moved
+    return os.path.realpath(os.path.join(os.path.dirname(index['path']), path)) if index['path'] else path
+
+def relate_path(index: dict, path: str) -> str:
+    return os.path.relpath(os.path.realpath(path), os.path.dirname(os.path.realpath(index['path']))) if index['path'] else path
+
+# LOOKUP #######################################################################
+
+def lookup(index: dict, key: str) -> tuple:
+    return index['entries'].get(key, ())
+
+def contains(index: dict, key: str) -> bool:
+    return key in index['entries']
+
+# UPDATE #######################################################################
+
+def insert(index: dict, entries: list) -> None:
+    __lines = []
+    for __k, __p, __g, __r in entries:
+        index['entries'][__k] = (os.path.realpath(__p) if index['path'] else __p, __g, __r)
+        __lines.append('{key}\t{path}\t{group}\t{row}\n'.format(key=__k, path=relate_path(index=index, path=__p), group=__g, row=__r))
+    # append only, the lines are small enough for the writes to be atomic
+    if index['path'] and __lines:
+        os.makedirs(os.path.dirname(index['path']) or '.', exist_ok=True)
+        with open(index['path'], 'a') as __file:
+            __file.write(''.join(__lines))
+
+def remove_file(index: dict, path: str) -> int:
+    __path = os.path.realpath(path) if index['path'] else path
+    # nothing to scan for a file that does not exist yet
+    if not os.path.exists(path):
+        return 0
+    __keys = [__k for __k, __v in index['entries'].items() if __v[0] == __path]
+    # the rows of a file that is rewritten are not duplicates of the new rows
+    for __k in __keys:
+        del index['entries'][__k]
+    # rewrite the whole index, it only happens when a file is replaced
+    if index['path'] and __keys:
+        # keep the lines appended by the other writers since the index was loaded
+        # only the lines appended during the rewrite itself are lost, run convert alone to be safe
+        for __k, __v in load_index(path=index['path'])['entries'].items():
+            if __v[0] != __path:
+                index['entries'].setdefault(__k, __v)
+        with open(index['path'] + '.tmp', 'w') as __file:
+            __file.write(''.join(
+                '{key}\t{path}\t{group}\t{row}\n'.format(key=__k, path=relate_path(index=index, path=__p), group=__g, row=__r)
+                for __k, (__p, __g, __r) in index['entries'].items()))
+        os.replace(index['path'] + '.tmp', index['path'])
+    return len(__keys)
@@ -0,0 +1,174 @@
+import bisect
+import json
+import os
+import re
+import time
+
+# CONSTANTS ####################################################################
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # seconds
+
+RATE_WINDOW = 60 # seconds
+FLUSH_TIME = 10 # seconds
+
+PREFIX = 'scrapscii'
+NAME_RE = re.compile(r'[^a-zA-Z0-9_]')
+
+# INIT #########################################################################
+
+def init_histogram(buckets: tuple=LATENCY_BUCKETS) -> dict:
+    return {
+        'buckets': list(buckets),
+        'counts': [0] * (len(buckets) + 1), # the last one is +Inf
+        'sum': 0.0,
+        'count': 0,}
+
+def init_rate(window: int=RATE_WINDOW, now: float=0.0) -> dict:
+    return {
+        'window': window,
+        'slots': [0] * window, # events per second, in a ring
+        'second': int(now or time.time()),}
+
+def init_registry(
+    counters: list=[],
+    gauges: list=[],
+    histograms: list=[],
+    buckets: tuple=LATENCY_BUCKETS,
+    window: int=RATE_WINDOW,
+) -> dict:
+    __now = time.time()
+    # all the metrics are allocated upfront, the updates happen in place
+    return {
+        'counters': {__n: 0 for __n in counters},
+        'gauges': {__n: 0 for __n in gauges},
+        'histograms': {__n: init_histogram(buckets=buckets) for __n in histograms},
+        'rate': init_rate(window=window, now=__now),
+        'start': __now,
+        'flushed': __now,}
+
+# UPDATE #######################################################################
+
+def increment(registry: dict, name: str, value: int=1) -> None:
+    __counters = registry['counters']
+    __counters[name] = __counters.get(name, 0) + value
+
+def assign(registry: dict, name: str, value: float) -> None:
+    registry['gauges'][name] = value
+
+def observe(registry: dict, name: str, value: float) -> None:
+    __histogram = registry['histograms'].get(name)
+    if __histogram is None:
+        __histogram = registry['histograms'][name] = init_histogram()
+    # the buckets are upper bounds, like the "le" label of Prometheus
+    __histogram['counts'][bisect.bisect_left(__histogram['buckets'], value)] += 1
+    __histogram['sum'] += value
+    __histogram['count'] += 1
+
+def measure(registry: dict, name: str, start: float) -> float:
+    # record the time elapsed since start and return the new reference
+    __now = time.perf_counter()
+    observe(registry, name=name, value=__now - start)
+    return __now
+
+def tick(registry: dict, value: int=1, now: float=0.0) -> None:
+    __rate = registry['rate']
+    __window = __rate['window']
+    __second = int(now or time.time())
+    # reset the slots of the seconds that passed without events
+    if __second != __rate['second']:
+        for __s in range(__rate['second'] + 1, min(__second, __rate['second'] + __window) + 1):
+            __rate['slots'][__s % __window] = 0
+        __rate['second'] = __second
+    __rate['slots'][__second % __window] += value
+
+# READ #########################################################################
+
+def rate(registry: dict, now: float=0.0) -> float:
+    __now = now or time.time()
+    # roll the window forward
+    tick(registry, value=0, now=__now)
+    # average over the window, or the uptime when shorter
+    __span = max(1.0, min(registry['rate']['window'], __now - registry['start']))
+    return sum(registry['rate']['slots']) / __span
+
+def export_registry(registry: dict, now: float=0.0) -> dict:
+    __now = now or time.time()
+    return {
+        'time': __now,
+        'uptime': __now - registry['start'],
+        'rate': rate(registry, now=__now),
+        'counters': dict(registry['counters']),
+        'gauges': dict(registry['gauges']),
+        'histograms': {
+            __n: {
+                'buckets': list(__h['buckets']),
+                'counts': list(__h['counts']),
+                'sum': __h['sum'],
+                'count': __h['count'],}
+            for __n, __h in registry['histograms'].items()},}
+
+def restore_registry(data: dict, registry: dict=None) -> dict:
+    __registry = registry or init_registry()
+    # resume the totals from a previous export
+    __registry['counters'].update(data.get('counters', {}))
+    __registry['gauges'].update(data.get('gauges', {}))
+    for __n, __h in data.get('histograms', {}).items():
+        __registry['histograms'][__n] = {
+            'buckets': list(__h['buckets']),
+            'counts': list(__h['counts']),
+            'sum': __h['sum'],
+            'count': __h['count'],}
+    return __registry
+
+# FORMAT #######################################################################
+
+def format_name(name: str, prefix: str=PREFIX) -> str:
+    return NAME_RE.sub('_', '{prefix}_{name}'.format(prefix=prefix, name=name))
+
+def format_prometheus(registry: dict, prefix: str=PREFIX, now: float=0.0) -> str:
+    __lines = []
+    # counters
+    for __n, __v in sorted(registry['counters'].items()):
+        __name = format_name(name=__n, prefix=prefix) + '_total'
+        __lines.append('# TYPE {name} counter'.format(name=__name))
+        __lines.append('{name} {value}'.format(name=__name, value=__v))
+    # gauges
+    for __n, __v in sorted(registry['gauges'].items()):
+        __name = format_name(name=__n, prefix=prefix)
+        __lines.append('# TYPE {name} gauge'.format(name=__name))
+        __lines.append('{name} {value}'.format(name=__name, value=__v))
+    # latency histograms, with cumulative buckets
+    for __n, __h in sorted(registry['histograms'].items()):
+        __name = format_name(name=__n, prefix=prefix) + '_seconds'
+        __lines.append('# TYPE {name} histogram'.format(name=__name))
+        __total = 0
+        for __b, __c in zip(__h['buckets'] + ['+Inf'], __h['counts']):
+            __total += __c
+            __lines.append('{name}_bucket{{le="{bound}"}} {value}'.format(name=__name, bound=__b, value=__total))
+        __lines.append('{name}_sum {value}'.format(name=__name, value=__h['sum']))
+        __lines.append('{name}_count {value}'.format(name=__name, value=__h['count']))
+    # rolling throughput
+    __name = format_name(name='throughput', prefix=prefix)
+    __lines.append('# TYPE {name} gauge'.format(name=__name))
+    __lines.append('{name} {value}'.format(name=__name, value=rate(registry, now=now)))
+    return '\n'.join(__lines) + '\n'
+
+# FLUSH ########################################################################
+
+def should_flush(registry: dict, interval: float=FLUSH_TIME, now: float=0.0) -> bool:
+    return (now or time.time()) - registry['flushed'] >= interval
+
+def flush(registry: dict, jsonl_path: str='', prometheus_path: str='', now: float=0.0) -> None:
+    __now = now or time.time()
+    # append to the history
+    if jsonl_path:
+        os.makedirs(os.path.dirname(jsonl_path) or '.', exist_ok=True)
+        with open(jsonl_path, 'a') as __file:
+            __file.write(json.dumps(export_registry(registry, now=__now)) + '\n')
+    # replace the latest values, atomically for the scrapers
+    if prometheus_path:
+        os.makedirs(os.path.dirname(prometheus_path) or '.', exist_ok=True)
+        with open(prometheus_path + '.tmp', 'w') as __file:
+            __file.write(format_prometheus(registry, now=__now))
+        os.replace(prometheus_path + '.tmp', prometheus_path)
+    registry['flushed'] = __now
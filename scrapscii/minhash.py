@@ -0,0 +1,157 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import scrapscii.data
+import scrapscii.index
+
+# CONSTANTS ####################################################################
+
+SHINGLE_LEN = 4 # characters, along the lines and along the columns
+PERMUTATION_LEN = 128
+BAND_LEN = 16 # of 8 rows each, the candidates are above ~0.7 similarity
+THRESHOLD = 0.8 # estimated Jaccard similarity
+SEED = 1337
+
+PRIME = np.uint64(1000003) # polynomial hash of the shingles
+SALT = np.uint64(0x9e3779b97f4a7c15) # separates the vertical shingles from the horizontal ones
+MASK = np.uint64((1 << 32) - 1)
+
+# SHINGLES #####################################################################
+
+def encode_grid(text: str) -> np.ndarray:
+    # 2D array of codepoints, padded with spaces
+    __text, __height, __width = scrapscii.data.pad_grid(text=scrapscii.index.normalize_content(text))
+    return np.frombuffer(__text.encode('utf-32-le', errors='surrogatepass'), dtype='<u4').reshape(__height, __width)
+
+def hash_windows(grid: np.ndarray, width: int=SHINGLE_LEN) -> np.ndarray:
+    # short lines still produce a shingle
+    __width = max(1, min(width, grid.shape[-1]))
+    __count = grid.shape[-1] - __width + 1
+    __grid = grid.astype(np.uint64)
+    __hash = np.zeros((grid.shape[0], max(0, __count)), dtype=np.uint64)
+    # rolling polynomial hash of all the windows at once, wrapping on 64 bits
+    for __i in range(__width):
+        __hash = __hash * PRIME + __grid[:, __i:__i + __count]
+    return __hash.ravel()
+
+def hash_blank(grid: np.ndarray, width: int=SHINGLE_LEN) -> np.uint64:
+    __hash = 0
+    # same as hash_windows on a window of spaces, with python integers to avoid the overflow warnings
+    for _ in range(max(1, min(width, grid.shape[-1]))):
+        __hash = (__hash * int(PRIME) + 32) % (1 << 64)
+    return np.uint64(__hash)
+
+def shingle_content(text: str, width: int=SHINGLE_LEN) -> np.ndarray:
+    __grid = encode_grid(text=text)
+    # line aware: the art is matched horizontally and vertically
+    __horizontal = hash_windows(grid=__grid, width=width)
+    __vertical = hash_windows(grid=__grid.T, width=width)
+    __shingles = np.concatenate([
+        # the windows made only of padding carry no information
+        __horizontal[__horizontal != hash_blank(grid=__grid, width=width)],
+        __vertical[__vertical != hash_blank(grid=__grid.T, width=width)] ^ SALT])
+    # fold to 32 bits
+    return np.unique((__shingles ^ (__shingles >> np.uint64(32))) & MASK)
+
+# SIGNATURE ####################################################################
+
+def init_permutations(count: int=PERMUTATION_LEN, seed: int=SEED) -> tuple:
+    __random = np.random.default_rng(seed)
+    # multiply-shift universal hash functions (a * x + b) >> 32, with a odd
+    return (
+        __random.integers(0, 1 << 64, size=count, dtype=np.uint64, endpoint=False) | np.uint64(1),
+        __random.integers(0, 1 << 64, size=count, dtype=np.uint64, endpoint=False),)
+
+def compute_signature(shingles: np.ndarray, permutations: tuple) -> np.ndarray:
+    __a, __b = permutations
+    # the signature of the empty set is only similar to itself
+    if not shingles.size:
+        return np.full(__a.shape, MASK, dtype=np.uint32)
+    # all the permutations of all the shingles at once, then the minimum of each permutation
+    __hashes = (__a[:, None] * shingles[None, :] + __b[:, None]) >> np.uint64(32)
+    return __hashes.min(axis=-1).astype(np.uint32)
+
+def similarity(left: np.ndarray, right: np.ndarray) -> float:
+    # estimated Jaccard similarity
+    return float(np.count_nonzero(left == right)) / left.size
+
+# INDEX ########################################################################
+
+def init_index(permutations: int=PERMUTATION_LEN, bands: int=BAND_LEN, threshold: float=THRESHOLD, seed: int=SEED) -> dict:
+    return {
+        'bands': bands,
+        'rows': permutations // bands,
+        'threshold': threshold,
+        'permutations': init_permutations(count=permutations, seed=seed),
+        'buckets': [{} for _ in range(bands)], # band bytes => members
+        'signatures': [],
+        'keys': [],
+        'parents': [],} # union find
+
+def find(index: dict, node: int) -> int:
+    __parents = index['parents']
+    # path halving
+    while __parents[node] != node:
+        __parents[node] = __parents[__parents[node]]
+        node = __parents[node]
+    return node
+
+def union(index: dict, left: int, right: int) -> None:
+    __left, __right = find(index, left), find(index, right)
+    # the earliest row represents the cluster
+    if __left != __right:
+        index['parents'][max(__left, __right)] = min(__left, __right)
+
+def insert(index: dict, text: str, key: object=None) -> int:
+    __signature = compute_signature(shingles=shingle_content(text), permutations=index['permutations'])
+    __node = len(index['keys'])
+    index['signatures'].append(__signature)
+    index['keys'].append(key)
+    index['parents'].append(__node)
+    # rows sharing a band are candidates, each checked once against the new row
+    __checked = set()
+    for __b, __buckets in enumerate(index['buckets']):
+        __members = __buckets.setdefault(__signature[__b * index['rows']:(__b + 1) * index['rows']].tobytes(), [])
+        for __m in __members:
+            if __m not in __checked and find(index, __m) != find(index, __node):
+                __checked.add(__m)
+                if similarity(__signature, index['signatures'][__m]) >= index['threshold']:
+                    union(index, __m, __node)
+        __members.append(__node)
+    return __node
+
+def cluster(index: dict) -> list:
+    __clusters = {}
+    for __n in range(len(index['keys'])):
+        __clusters.setdefault(find(index, __n), []).append(index['keys'][__n])
+    # the first key of each cluster is its representative
+    return [__c for __c in __clusters.values() if len(__c) > 1]
+
+# PARQUET ######################################################################
+
+def index_parquet(paths: list, index: dict, column: str='content') -> None:
+    # the rows are identified by (file, row group, row)
+    for __p in paths:
+        __file = pq.ParquetFile(__p)
+        for __g in range(__file.metadata.num_row_groups):
+            for __r, __c in enumerate(__file.read_row_group(__g, columns=[column]).column(column).to_pylist()):
+                insert(index=index, text=__c or '', key=(__p, __g, __r))
+
+def export_representatives(paths: list, clusters: list, root: str, path: str) -> list:
+    __outputs = []
+    # all the rows but the first of each cluster
+    __dropped = {tuple(__k) for __c in clusters for __k in __c[1:]}
+    for __p in paths:
+        # filter in arrow, the rows are copied as is with the schema of the source (raw column included)
+        __mask = pa.array([(__p, __g, __i) not in __dropped for __g, __i in scrapscii.data.locate_rows(path=__p)], type=pa.bool_())
+        __table = pq.read_table(__p).filter(__mask)
+        # same layout as the input directory
+        __outputs.append(os.path.join(path, os.path.relpath(__p, root)))
+        os.makedirs(os.path.dirname(__outputs[-1]), exist_ok=True)
+        # write to a temp file first, so that readers never see partial files
+        pq.write_table(table=__table, where=__outputs[-1] + '.tmp')
+        os.replace(__outputs[-1] + '.tmp', __outputs[-1])
+    return __outputs
@@ -0,0 +1,121 @@
+import io
+import os
+
+import PIL.Image
+
+# CONSTANTS ####################################################################
+
+HASH_BITS = 64
+DISTANCE_MAX = 4 # bits
+
+RECORD_LEN = 16 # bytes: 8 for the perceptual hash + 8 for the key of the source
+
+# HASH #########################################################################
+
+def compute_hash(image: PIL.Image.Image) -> int:
+    # difference hash: compare the neighbor pixels of a 9x8 grayscale thumbnail
+    __pixels = list(image.convert('L').resize((9, 8), PIL.Image.LANCZOS).getdata())
+    __hash = 0
+    for __r in range(8):
+        for __c in range(8):
+            __hash = (__hash << 1) | int(__pixels[9 * __r + __c] < __pixels[9 * __r + __c + 1])
+    return __hash
+
+def decode_image(data: bytes=b'', path: str='', size: tuple=(64, 64)) -> PIL.Image.Image:
+    # from memory or from disk
+    __image = PIL.Image.open(io.BytesIO(data) if data else path)
+    # let the JPEG decoder downscale directly, the hash only needs a thumbnail
+    __image.draft('L', size)
+    __image.load()
+    return __image
+
+def compute_key(key: str) -> int:
+    # truncated hex digest (sha1 of the URL for example)
+    return int(key[:16], 16)
+
+def hamming(left: int, right: int) -> int:
+    return (left ^ right).bit_count()
+
+# INDEX ########################################################################
+
+def split_pieces(distance: int=DISTANCE_MAX, bits: int=HASH_BITS) -> list:
+    # pigeonhole: two hashes within the distance share at least one of the (distance + 1) pieces exactly
+    __count = distance + 1
+    __sizes = [bits // __count + int(__i < bits % __count) for __i in range(__count)]
+    __shifts = [sum(__sizes[__i + 1:]) for __i in range(__count)]
+    return [(__s, (1 << __z) - 1) for __s, __z in zip(__shifts, __sizes)]
+
+def init_index(distance: int=DISTANCE_MAX) -> dict:
+    __pieces = split_pieces(distance=distance)
+    return {
+        'distance': distance,
+        'pieces': __pieces,
+        'tables': [{} for _ in __pieces], # piece value => [(hash, key), ...]
+        'count': 0,}
+
+def insert(index: dict, value: int, key: int=0) -> None:
+    for (__s, __m), __t in zip(index['pieces'], index['tables']):
+        __t.setdefault((value >> __s) & __m, []).append((value, key))
+    index['count'] += 1
+
+def search(index: dict, value: int, key: int=0, distance: int=-1) -> tuple:
+    __distance = index['distance'] if distance < 0 else min(distance, index['distance'])
+    # only the candidates sharing a piece need to be compared
+    for (__s, __m), __t in zip(index['pieces'], index['tables']):
+        for __v, __k in __t.get((value >> __s) & __m, ()):
+            # the same source is not a duplicate of itself, when re-rendering
+            if __k != key and hamming(value, __v) <= __distance:
+                return (__v, __k)
+    return ()
+
+def contains(index: dict, value: int, key: int=0) -> bool:
+    __s, __m = index['pieces'][0]
+    return (value, key) in index['tables'][0].get((value >> __s) & __m, ())
+
+# PERSIST ######################################################################
+
+def load_index(path: str, distance: int=DISTANCE_MAX) -> dict:
+    __index = init_index(distance=distance)
+    __paths = [path] if os.path.isfile(path) else []
+    # gather the indexes of all the workers
+    if os.path.isdir(path):
+        __paths = sorted(
+            os.path.join(__dp, __f)
+            for __dp, __dn, __fn in os.walk(path)
+            for __f in __fn if __f.endswith('.phash'))
+    for __p in __paths:
+        with open(__p, 'rb') as __file:
+            __data = __file.read()
+        # ignore a record truncated by a crash
+        for __i in range(0, len(__data) - len(__data) % RECORD_LEN, RECORD_LEN):
+            insert(__index, value=int.from_bytes(__data[__i:__i + 8], 'big'), key=int.from_bytes(__data[__i + 8:__i + 16], 'big'))
+    return __index
+
+def append_index(path: str, value: int, key: int=0) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # the records are small enough for the appends to be atomic
+    with open(path, 'ab') as __file:
+        __file.write(value.to_bytes(8, 'big') + key.to_bytes(8, 'big'))
+
+# DEDUPLICATE ##################################################################
+
+def hash_image(data: bytes=b'', path: str='') -> int:
+    # hash the decoded pixels, the bytes differ for resized or recompressed copies
+    try:
+        return compute_hash(decode_image(data=data, path=path))
+    # not an image, or truncated
+    except Exception:
+        return -1
+
+def check_hash(index: dict, value: int, key: int=0) -> str:
+    if value < 0:
+        return 'decode'
+    # near duplicate of another source
+    return 'duplicate' if search(index, value=value, key=key) else ''
+
+def register_hash(index: dict, value: int, key: int=0, path: str='') -> None:
+    # only once the image gave rows, otherwise its copies would never be rendered
+    if not contains(index, value=value, key=key):
+        insert(index, value=value, key=key)
+        if path:
+            append_index(path, value=value, key=key)
@@ -3,11 +3,136 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import os
+import tempfile
+import threading
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem
+from twisted.internet import threads
+
+import scrapscii.cache
+import scrapscii.data
+import scrapscii.images
+import scrapscii.index
+import scrapscii.phash
+import scrapscii.unicode
 
 
 class ScrapsciiPipeline:
     def process_item(self, item, spider):
         return item
+
+# IMAGES #######################################################################
+
+DATA_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets/images/crawl'))
+INDEX_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets/contents.index')) # shared with convert
+TABLE_LEN = 2**4
+
+class ImagesPipeline:
+    def __init__(self, data_path: str, index_path: str, table_len: int, variant_len: int, time_max: float):
+        self._data_path = data_path
+        self._index_path = index_path
+        self._table_len = table_len
+        self._variant_len = variant_len
+        self._time_max = time_max
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # same knobs as stylize, through the scrapy settings
+        return cls(
+            data_path=crawler.settings.get('IMAGES_DATA_PATH', DATA_PATH),
+            index_path=crawler.settings.get('IMAGES_INDEX_PATH', INDEX_PATH),
+            table_len=crawler.settings.getint('IMAGES_TABLE_LEN', TABLE_LEN),
+            variant_len=crawler.settings.getint('IMAGES_VARIANT_LEN', scrapscii.images.VARIANT_LEN),
+            time_max=crawler.settings.getfloat('IMAGES_TIME_MAX', scrapscii.images.TIME_MAX),)
+
+    def open_spider(self, spider):
+        self._table = []
+        # append after the shards of the previous runs
+        self._shard = len(scrapscii.data.list_parquet(self._data_path))
+        # perceptual hashes of the images already converted
+        self._phash_path = os.path.join(self._data_path, 'images.phash')
+        self._index = scrapscii.phash.load_index(path=self._data_path)
+        # exact duplicates of the contents, disabled with an empty path
+        self._contents = scrapscii.index.load_index(path=self._index_path) if self._index_path else None
+        # the renderers share the index across the threads of the pool
+        self._lock = threading.Lock()
+
+    def close_spider(self, spider):
+        if self._table:
+            self.export(spider)
+
+    # PROCESS ##################################################################
+
+    def process_item(self, item, spider):
+        __item = ItemAdapter(item)
+        # the HTML crawls go through untouched
+        if 'image' not in __item:
+            return item
+        # the decoding and the converter are costly, keep them off the reactor thread
+        __deferred = threads.deferToThread(self.render, url=__item['url'], image=__item['image'], extension=__item['extension'], captions=__item['captions'])
+        return __deferred.addCallback(self.collect, url=__item['url'], spider=spider)
+
+    def render(self, url: str, image: bytes, extension: str, captions: list) -> tuple:
+        __rows = []
+        # skip the near duplicates before the costly rendering
+        __key = scrapscii.phash.compute_key(scrapscii.cache.hash_url(url))
+        __value = scrapscii.phash.hash_image(data=image)
+        # only the index is serialized across the threads of the pool, not the decoding
+        with self._lock:
+            __reason = scrapscii.phash.check_hash(self._index, value=__value, key=__key)
+        if __reason:
+            return (__reason, __rows)
+        # the converter reads from disk, the file only lives for the conversion
+        __fd, __path = tempfile.mkstemp(suffix='.' + extension)
+        try:
+            with os.fdopen(__fd, 'wb') as __file:
+                __file.write(image)
+            __rows = self.convert(path=__path, captions=captions)
+        finally:
+            os.remove(__path)
+        if not __rows:
+            return ('asciiart', __rows)
+        # the image is part of the dataset now, its copies are duplicates
+        with self._lock:
+            scrapscii.phash.register_hash(self._index, value=__value, key=__key, path=self._phash_path)
+        return ('', __rows)
+
+    def convert(self, path: str, captions: list) -> list:
+        __rows = []
+        # several variants per image, each with its own caption
+        __variants = scrapscii.images.random_variants(count=self._variant_len)
+        __captions = scrapscii.images.random_captions(captions=captions, count=len(__variants))
+        for __options, __caption in zip(__variants, __captions):
+            __content = scrapscii.images.convert_image(path=path, options=scrapscii.images.format_args(__options), timeout=self._time_max)
+            if scrapscii.images.is_valid_ascii(__content):
+                __rows.append({
+                    'caption': __caption,
+                    'content': __content,
+                    'labels': ','.join(scrapscii.images.format_labels(__options)),
+                    **scrapscii.unicode.annotate(__content),})
+        return __rows
+
+    def collect(self, result: tuple, url: str, spider):
+        __reason, __rows = result
+        # back on the reactor thread, the stats and the table are not shared with the renderers
+        if __reason:
+            spider.crawler.stats.inc_value('images/rejected/' + __reason)
+            raise DropItem(__reason)
+        spider.crawler.stats.inc_value('images/valid')
+        spider.crawler.stats.inc_value('images/rows', len(__rows))
+        self._table.extend(__rows)
+        if len(self._table) >= self._table_len:
+            self.export(spider)
+        # the image bytes stay out of the feeds
+        return {'url': url, 'rows': len(__rows)}
+
+    def export(self, spider):
+        __path = os.path.join(self._data_path, '{index:0>4d}.parquet'.format(index=self._shard))
+        os.makedirs(self._data_path, exist_ok=True)
+        scrapscii.data.export_table_as_parquet(table=self._table, path=__path, index=self._contents)
+        spider.logger.info('Exported %d rows to %s' % (len(self._table), __path))
+        self._shard += 1
+        self._table = []
@@ -0,0 +1,132 @@
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# CONSTANTS ####################################################################
+
+PROFILE_PATH = os.environ.get('SCRAPSCII_PROFILE', '') # disabled when empty
+INTERVAL = float(os.environ.get('SCRAPSCII_PROFILE_INTERVAL', 0.005)) # seconds
+
+# the innermost frame matching one of these functions gives the stage of a sample
+STAGE_DICT = {
+    'lookup_section': 'lookup',
+    'lookup_category': 'lookup',
+    'annotate': 'annotation',
+    'parse': 'parse',
+    'download_image': 'download',
+    'fetch_image': 'download',
+    'parse_content': 'download',
+    'convert_image': 'render',
+    'text2art': 'render',
+    'render_word': 'render',
+    'export_table_as_parquet': 'export',
+    'export_table_as_codepoints': 'export',
+    'export_table': 'export',
+    'export_font': 'export',}
+
+# innermost frames of the threads that are blocked, waiting for work or events
+IDLE_LIST = ['threading:wait', 'threading:_wait_for_tstate_lock', 'selectors:select', 'queue:get']
+
+STAGE_LIST = ['lookup', 'annotation', 'parse', 'download', 'render', 'export', 'idle', 'other']
+
+# SAMPLE #######################################################################
+
+def format_frame(frame: object) -> str:
+    return '{module}:{function}'.format(module=frame.f_globals.get('__name__', '?'), function=frame.f_code.co_name)
+
+def walk_stack(frame: object) -> list:
+    __stack = []
+    # from the leaf up to the root
+    while frame is not None:
+        __stack.append(frame)
+        frame = frame.f_back
+    return __stack
+
+def find_stage(stack: list, stages: dict=STAGE_DICT, idle: list=IDLE_LIST) -> str:
+    if stack and format_frame(stack[0]) in idle:
+        return 'idle'
+    return next((stages[__f.f_code.co_name] for __f in stack if __f.f_code.co_name in stages), 'other')
+
+def sample(profiler: dict) -> None:
+    __names = {__t.ident: __t.name for __t in threading.enumerate()}
+    # wall clock of every thread, the reactor and its pool, except the sampler
+    for __ident, __frame in sys._current_frames().items():
+        if __ident == profiler['ident']:
+            continue
+        __stack = walk_stack(__frame)
+        # one root per thread in the flame graphs
+        __root = 'thread:{name}'.format(name=__names.get(__ident, __ident))
+        profiler['stacks'][';'.join([__root] + [format_frame(__f) for __f in reversed(__stack)])] += 1
+        profiler['stages'][find_stage(__stack)] += 1
+        profiler['samples'] += 1
+    profiler['ticks'] += 1
+
+def run(profiler: dict) -> None:
+    profiler['ident'] = threading.get_ident()
+    while not profiler['event'].wait(profiler['interval']):
+        sample(profiler)
+
+# INIT #########################################################################
+
+def start(path: str, interval: float=INTERVAL) -> dict:
+    __profiler = {
+        'path': path,
+        'interval': interval,
+        'start': time.time(),
+        'ident': None, # set by the sampler thread
+        'ticks': 0,
+        'samples': 0,
+        'stacks': collections.Counter(),
+        'stages': collections.Counter(),
+        'event': threading.Event(),}
+    # the sampler runs alongside the program, in the same process
+    __profiler['thread'] = threading.Thread(target=run, args=(__profiler,), name='scrapscii-profiler', daemon=True)
+    __profiler['thread'].start()
+    return __profiler
+
+def stop(profiler: dict) -> None:
+    profiler['event'].set()
+    profiler['thread'].join()
+    export(profiler)
+
+@contextlib.contextmanager
+def profile(path: str=PROFILE_PATH, interval: float=INTERVAL) -> iter:
+    # no overhead at all when disabled
+    if not path:
+        yield None
+        return
+    __profiler = start(path=path, interval=interval)
+    try:
+        yield __profiler
+    finally:
+        stop(__profiler)
+
+# EXPORT #######################################################################
+
+def summarize(profiler: dict, stages: list=STAGE_LIST) -> dict:
+    __total = max(1, profiler['samples'])
+    return {
+        'interval': profiler['interval'],
+        'uptime': time.time() - profiler['start'],
+        'ticks': profiler['ticks'],
+        'samples': profiler['samples'],
+        # thread time, it adds up beyond the uptime when several threads run
+        'stages': {
+            __s: {
+                'samples': profiler['stages'][__s],
+                'time': profiler['stages'][__s] * profiler['interval'],
+                'share': profiler['stages'][__s] / __total,}
+            for __s in stages},}
+
+def export(profiler: dict) -> None:
+    os.makedirs(os.path.dirname(profiler['path']) or '.', exist_ok=True)
+    # collapsed stacks, the input format of flamegraph.pl, speedscope, inferno...
+    with open(profiler['path'] + '.collapsed', 'w') as __file:
+        __file.write(''.join('{stack} {count}\n'.format(stack=__s, count=__c) for __s, __c in profiler['stacks'].most_common()))
+    # time spent in each stage of the pipeline
+    with open(profiler['path'] + '.stages.json', 'w') as __file:
+        json.dump(summarize(profiler), __file, indent=1)
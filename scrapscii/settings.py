@@ -1,3 +1,5 @@
+import os
+
 BOT_NAME = "scrapscii"
 
 SPIDER_MODULES = ["scrapscii.spiders"]
@@ -50,6 +52,13 @@ FEED_EXPORT_ENCODING = "utf-8"
 #EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
 #}
+EXTENSIONS = {
+    "scrapscii.extensions.ProfilerExtension": 500,
+}
+
+# Sample the stacks of the crawl, disabled when empty (see scrapscii.profiler)
+PROFILE_PATH = os.environ.get("SCRAPSCII_PROFILE", "")
+PROFILE_INTERVAL = float(os.environ.get("SCRAPSCII_PROFILE_INTERVAL", 0.005))
 
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 #ITEM_PIPELINES = {
@@ -4,6 +4,8 @@ import scrapscii.unicode
 
 # TARGETS ######################################################################
 
+BASE_URL = 'https://www.asciiart.eu'
+
 TARGET_DICT = {
     'animals': ['aardvarks', 'amoeba', 'bats', 'bears', 'beavers', 'birds-land', 'birds-water', 'bisons', 'camels', 'cats', 'cows', 'deer', 'dogs', 'dolphins', 'elephants', 'fish', 'frogs', 'insects/ants', 'insects/bees', 'insects/beetles', 'insects/butterflies', 'insects/caterpillars', 'insects/cockroaches', 'insects/other', 'insects/snails', 'insects/worms', 'horses', 'marsupials', 'monkeys', 'moos', 'other-land', 'other-water', 'rabbits', 'reptiles/alligators', 'reptiles/dinosaurs', 'reptiles/lizards', 'reptiles/snakes', 'rhinoceros', 'rodents/mice', 'rodents/other', 'scorpions', 'spiders', 'wolves', ],
     'art-and-design': ['artists', 'borders', 'celtic', 'dividers', 'egyptian', 'escher', 'famous-paintings', 'fleur-de-lis', 'fractals', 'gender-symbols', 'geometries', 'mazes', 'mona-lisa', 'origamis', 'other', 'patterns', 'pentacles', 'sculptures'],
@@ -40,13 +42,21 @@ class AsciiArtSpider(scrapy.Spider):
 
     # META #####################################################################
 
-    urls = [
-        f'https://www.asciiart.eu/{__c}/{__i}'
-        for __c, __l in TARGET_DICT.items()
-        for __i in __l]
+    def __init__(self, base_url: str=BASE_URL, *args, **kwargs):
+        super(AsciiArtSpider, self).__init__(*args, **kwargs)
+        # the load tests point the spider to a local stand-in
+        self.urls = [
+            f'{base_url.rstrip("/")}/{__c}/{__i}'
+            for __c, __l in TARGET_DICT.items()
+            for __i in __l]
 
     # SCRAPING #################################################################
 
+    async def start(self):
+        # scrapy >= 2.13 ignores start_requests, the older versions ignore start
+        for __r in self.start_requests():
+            yield __r
+
     def start_requests(self):
         for __u in self.urls:
             yield scrapy.Request(url=__u, callback=self.parse)
@@ -67,5 +77,4 @@ class AsciiArtSpider(scrapy.Spider):
                     'caption': __caption,
                     'content': __content,
                     'labels': ','.join(__t.replace('-', ' ').capitalize() for __t in __labels),
-                    'charsets': ','.join(set(scrapscii.unicode.lookup_section(__c) for __c in __content)),
-                    'chartypes': ','.join(set(scrapscii.unicode.lookup_category(__c) for __c in __content)),}
+                    **scrapscii.unicode.annotate(__content),}
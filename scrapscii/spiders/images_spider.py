@@ -0,0 +1,123 @@
+import itertools
+
+import scrapy
+import scrapy.exceptions
+import scrapy.signals
+import scrapy.spidermiddlewares.httperror
+import scrapy.utils.defer
+import twisted.internet.error
+import twisted.internet.threads
+
+import scrapscii.images
+
+# SOURCE #######################################################################
+
+DATASET = 'apple/DataCompDR-12M'
+TOTAL_LEN = 2**10
+BATCH_LEN = 2**6 # samples fetched from the stream at once
+
+# failures => rejection reason, like stylize
+ERROR_DICT = {
+    scrapy.spidermiddlewares.httperror.HttpError: 'status',
+    twisted.internet.error.DNSLookupError: 'dns',
+    twisted.internet.error.TimeoutError: 'read',
+    twisted.internet.error.ConnectionRefusedError: 'connect',
+    twisted.internet.error.ConnectError: 'connect',}
+
+# DATACOMP #####################################################################
+
+class ImagesSpider(scrapy.Spider):
+    name = 'images'
+
+    # META #####################################################################
+
+    # the images are spread over many hosts, the limits apply per domain
+    custom_settings = {
+        'CONCURRENT_REQUESTS': 32,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+        'DOWNLOAD_DELAY': 0,
+        'DOWNLOAD_TIMEOUT': 10,
+        'DOWNLOAD_MAXSIZE': scrapscii.images.SIZE_MAX,
+        'RETRY_TIMES': 1,
+        'ITEM_PIPELINES': {'scrapscii.pipelines.ImagesPipeline': 300},}
+
+    def __init__(self, dataset: str=DATASET, total: int=TOTAL_LEN, rank: int=0, workers: int=1, *args, **kwargs):
+        super(ImagesSpider, self).__init__(*args, **kwargs)
+        # the spider arguments are strings on the command line
+        self.dataset = dataset
+        self.total = int(total)
+        self.rank = int(rank)
+        self.workers = int(workers)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        __spider = super(ImagesSpider, cls).from_crawler(crawler, *args, **kwargs)
+        # reject before the body is downloaded
+        crawler.signals.connect(__spider.headers_received, signal=scrapy.signals.headers_received)
+        return __spider
+
+    # SAMPLES ##################################################################
+
+    def load_samples(self) -> iter:
+        # dev dependency, only needed by this spider
+        import datasets
+        import datasets.distributed
+        __dataset = datasets.load_dataset(self.dataset, split='train', streaming=True)
+        # each crawler process takes its slice of the stream
+        if self.workers > 1:
+            __dataset = datasets.distributed.split_dataset_by_node(__dataset, rank=self.rank, world_size=self.workers)
+        return itertools.islice(__dataset, 0, self.total)
+
+    # SCRAPING #################################################################
+
+    async def start(self):
+        # the stream is read over the network, in a thread so that the downloads keep going
+        __samples = await self.defer(self.load_samples)
+        __batch = await self.defer(list, itertools.islice(__samples, BATCH_LEN))
+        while __batch:
+            for __s in __batch:
+                yield self.format_request(__s)
+            __batch = await self.defer(list, itertools.islice(__samples, BATCH_LEN))
+
+    def start_requests(self):
+        # scrapy < 2.13 only, the reactor waits on the stream
+        for __s in self.load_samples():
+            yield self.format_request(__s)
+
+    def defer(self, func: callable, *args) -> object:
+        return scrapy.utils.defer.maybe_deferred_to_future(twisted.internet.threads.deferToThread(func, *args))
+
+    def format_request(self, sample: dict) -> scrapy.Request:
+        return scrapy.Request(url=sample['url.txt'], callback=self.parse, errback=self.reject, cb_kwargs={'captions': sample['syn.json']['syn_text']})
+
+    def headers_received(self, headers, body_length, request, spider):
+        if spider is not self:
+            return
+        if not scrapscii.images.is_valid_type(headers.get('Content-Type', b'').decode('latin-1')):
+            self.count(reason='type')
+            raise scrapy.exceptions.StopDownload(fail=True)
+
+    def reject(self, failure):
+        # already counted when the download was stopped
+        if failure.check(scrapy.exceptions.StopDownload):
+            return
+        self.count(reason=next((__r for __e, __r in ERROR_DICT.items() if failure.check(__e)), 'request'))
+
+    def count(self, reason: str) -> None:
+        self.crawler.stats.inc_value('images/rejected/' + reason)
+
+    # PARSING ##################################################################
+
+    def parse(self, response, captions):
+        __magic = scrapscii.images.parse_magic(response.body[:scrapscii.images.HEAD_LEN])
+        # check the actual content, the headers can lie
+        if not __magic:
+            return self.count(reason='magic')
+        if not scrapscii.images.is_valid_image(response.body):
+            return self.count(reason='image')
+        # the rendering happens in the pipeline
+        yield {
+            'url': response.url,
+            'image': response.body,
+            'extension': __magic,
+            'captions': list(captions),}
@@ -2,6 +2,11 @@ import scrapy
 
 import scrapscii.unicode
 
+# TARGETS ######################################################################
+
+BASE_URL = 'https://www.twitchquotes.com'
+PAGE_LEN = 53
+
 # COPYPASTA ####################################################################
 
 class TwitchQuotesSpider(scrapy.Spider):
@@ -9,12 +14,20 @@ class TwitchQuotesSpider(scrapy.Spider):
 
     # META #####################################################################
 
-    urls = [
-        f'https://www.twitchquotes.com/copypastas/ascii-art?page={__i}'
-        for __i in range(1, 54)]
+    def __init__(self, base_url: str=BASE_URL, *args, **kwargs):
+        super(TwitchQuotesSpider, self).__init__(*args, **kwargs)
+        # the load tests point the spider to a local stand-in
+        self.urls = [
+            f'{base_url.rstrip("/")}/copypastas/ascii-art?page={__i}'
+            for __i in range(1, PAGE_LEN + 1)]
 
     # SCRAPING #################################################################
 
+    async def start(self):
+        # scrapy >= 2.13 ignores start_requests, the older versions ignore start
+        for __r in self.start_requests():
+            yield __r
+
     def start_requests(self):
         for __u in self.urls:
             yield scrapy.Request(url=__u, callback=self.parse)
@@ -33,5 +46,4 @@ class TwitchQuotesSpider(scrapy.Spider):
                     'caption': __caption.strip(),
                     'content': __content,
                     'labels': ','.join(__l.strip().capitalize() for __l in set(__labels) if __l.strip()),
-                    'charsets': ','.join(set(scrapscii.unicode.lookup_section(__c) for __c in __content)),
-                    'chartypes': ','.join(set(scrapscii.unicode.lookup_category(__c) for __c in __content)),}
+                    **scrapscii.unicode.annotate(__content),}
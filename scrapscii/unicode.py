@@ -2,6 +2,8 @@ import os
 import re
 import unicodedata
 
+import scrapscii.canonical
+
 # CATEGORIES ###################################################################
 
 CATEGORY_DICT = {
@@ -403,3 +405,13 @@ def lookup_category(character: str) -> str:
     return CATEGORY_DICT.get(
         unicodedata.category(character)[:1],
         '')
+
+# ANNOTATE #####################################################################
+
+def annotate(content: str) -> dict:
+    # describe the content as it is exported, without the invisible whitespace
+    __characters = set(scrapscii.canonical.canonicalize_text(content))
+    # sorted, the order of the sets changes with the hash seed
+    return {
+        'charsets': ','.join(sorted(set(lookup_section(__c) for __c in __characters))),
+        'chartypes': ','.join(sorted(set(lookup_category(__c) for __c in __characters))),}
@@ -0,0 +1,173 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pyarrow as pa
+import scrapy.http
+
+import scrapscii.cli
+import scrapscii.data
+import scrapscii.images
+import scrapscii.spiders.asciiart_spider
+import scrapscii.spiders.twitchquotes_spider
+import scrapscii.unicode
+
+# META #########################################################################
+
+FIXTURES_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), 'fixtures'))
+BASELINE_PATH = os.path.join(FIXTURES_PATH, 'baseline.json')
+IMAGE_PATH = os.path.join(FIXTURES_PATH, 'image.png')
+
+# MEASURES #####################################################################
+
+REPEAT_LEN = 5
+TOLERANCE = 0.25 # relative degradation before a benchmark is flagged
+
+METRIC_LIST = ['time', 'memory', 'arrow'] # lower is better
+
+# TARGETS ######################################################################
+
+SPIDER_DICT = {
+    'asciiart': (scrapscii.spiders.asciiart_spider.AsciiArtSpider, 'https://www.asciiart.eu/animals/cats'),
+    'twitchquotes': (scrapscii.spiders.twitchquotes_spider.TwitchQuotesSpider, 'https://www.twitchquotes.com/copypastas/ascii-art?page=1'),}
+
+FONT_LIST = ['3d_diagonal', 'banner3', 'big', 'block', 'standard', 'starwars', 'tarty1']
+
+STYLIZE_OPTIONS = ['--width 64', '--braille', '--complex']
+
+# FIXTURES #####################################################################
+
+def load_response(spider: str, path: str=FIXTURES_PATH) -> scrapy.http.HtmlResponse:
+    # saved pages, so that the benchmarks run offline
+    with open(os.path.join(path, spider + '.html'), 'rb') as __file:
+        return scrapy.http.HtmlResponse(url=SPIDER_DICT[spider][-1], body=__file.read(), encoding='utf-8')
+
+def parse_fixture(spider: str, path: str=FIXTURES_PATH) -> list:
+    return list(SPIDER_DICT[spider][0]().parse(load_response(spider=spider, path=path)))
+
+def load_rows(path: str=FIXTURES_PATH) -> list:
+    return [__r for __s in sorted(SPIDER_DICT.keys()) for __r in parse_fixture(spider=__s, path=path)]
+
+# MEASURE ######################################################################
+
+def measure(func: callable, units: int=1, repeat: int=REPEAT_LEN) -> dict:
+    # the peak memory is measured on a separate run, tracing slows the code down
+    __pool = pa.default_memory_pool()
+    # tracemalloc does not see the arrow buffers, they are tracked by a pool of their own
+    __proxy = pa.proxy_memory_pool(__pool)
+    pa.set_memory_pool(__proxy)
+    tracemalloc.start()
+    try:
+        func()
+        __memory = tracemalloc.get_traced_memory()[-1]
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(__pool)
+    __arrow = __proxy.max_memory()
+    # the fastest run is the least noisy estimate
+    __times = []
+    for _ in range(repeat):
+        __start = time.perf_counter()
+        func()
+        __times.append(time.perf_counter() - __start)
+    __time = min(__times) / max(1, units)
+    return {'units': units, 'time': __time, 'rate': 1. / __time if __time else 0., 'memory': __memory, 'arrow': __arrow}
+
+# BENCHMARKS ###################################################################
+
+def bench_unicode(rows: list, repeat: int=REPEAT_LEN) -> dict:
+    __characters = ''.join(__r['content'] for __r in rows)
+    return {
+        'lookup_section': measure(lambda: [scrapscii.unicode.lookup_section(__c) for __c in __characters], units=len(__characters), repeat=repeat),
+        'lookup_category': measure(lambda: [scrapscii.unicode.lookup_category(__c) for __c in __characters], units=len(__characters), repeat=repeat),
+        'annotation': measure(lambda: [scrapscii.unicode.annotate(__r['content']) for __r in rows], units=len(rows), repeat=repeat),}
+
+def bench_data(rows: list, repeat: int=REPEAT_LEN) -> dict:
+    with tempfile.TemporaryDirectory() as __dir:
+        __parquet = os.path.join(__dir, 'export.parquet')
+        __json = os.path.join(__dir, 'cast.json')
+        # the input of the conversion
+        with open(__json, 'w') as __file:
+            json.dump(rows, __file)
+        return {
+            'export_table_as_parquet': measure(lambda: scrapscii.data.export_table_as_parquet(table=rows, path=__parquet), units=len(rows), repeat=repeat),
+            'cast_json_to_parquet': measure(lambda: scrapscii.data.cast_json_to_parquet(path=__json), units=len(rows), repeat=repeat),}
+
+def bench_spiders(repeat: int=REPEAT_LEN, path: str=FIXTURES_PATH) -> dict:
+    __results = {}
+    for __s, (__spider, _) in SPIDER_DICT.items():
+        __response = load_response(spider=__s, path=path)
+        __count = len(list(__spider().parse(__response)))
+        __results['parse/' + __s] = measure(lambda: list(__spider().parse(__response)), units=__count, repeat=repeat)
+    return __results
+
+def bench_graffiti(fonts: list=FONT_LIST, repeat: int=REPEAT_LEN) -> dict:
+    __script = scrapscii.cli.load_script('graffiti')
+    __results = {}
+    for __f in fonts:
+        __count = len(__script.generate_font(font=__f))
+        __results['graffiti/' + __f] = measure(lambda: __script.generate_font(font=__f), units=__count, repeat=repeat)
+    return __results
+
+def bench_stylize(path: str=IMAGE_PATH, options: list=STYLIZE_OPTIONS, repeat: int=REPEAT_LEN) -> dict:
+    # the converter is an external binary
+    if shutil.which('ascii-image-converter') is None:
+        return {}
+    __args = scrapscii.images.format_args(options)
+    return {'stylize/convert_image': measure(lambda: scrapscii.images.convert_image(path=path, options=__args), units=1, repeat=repeat)}
+
+def run_all(repeat: int=REPEAT_LEN) -> dict:
+    __rows = load_rows()
+    __results = {}
+    __results.update(bench_unicode(rows=__rows, repeat=repeat))
+    __results.update(bench_data(rows=__rows, repeat=repeat))
+    __results.update(bench_spiders(repeat=repeat))
+    __results.update(bench_graffiti(repeat=repeat))
+    __results.update(bench_stylize(repeat=repeat))
+    return __results
+
+# BASELINE #####################################################################
+
+def save_baseline(results: dict, path: str=BASELINE_PATH) -> None:
+    with open(path, 'w') as __file:
+        json.dump(results, __file, indent=1, sort_keys=True)
+
+def load_baseline(path: str=BASELINE_PATH) -> dict:
+    with open(path, 'r') as __file:
+        return json.load(__file)
+
+def compare(results: dict, baseline: dict, tolerance: float=TOLERANCE, metrics: list=METRIC_LIST) -> list:
+    __regressions = []
+    # only the benchmarks present on both sides can be compared
+    for __n in sorted(set(results) & set(baseline)):
+        for __m in metrics:
+            # the baselines saved before a metric was added do not have it
+            __before, __after = baseline[__n].get(__m, 0), results[__n].get(__m, 0)
+            if __before and __after > (1. + tolerance) * __before:
+                __regressions.append({'name': __n, 'metric': __m, 'before': __before, 'after': __after, 'ratio': __after / __before})
+    return __regressions
+
+# MAIN #########################################################################
+
+if __name__ == '__main__':
+    # nothing to compare with, before running anything
+    if 'compare' in sys.argv[1:] and not os.path.isfile(BASELINE_PATH):
+        print('no baseline at {}, run with save first'.format(BASELINE_PATH), file=sys.stderr)
+        sys.exit(1)
+
+    __results = run_all(repeat=REPEAT_LEN)
+    print(json.dumps(__results, indent=1))
+
+    # record the reference measures
+    if 'save' in sys.argv[1:]:
+        save_baseline(results=__results, path=BASELINE_PATH)
+
+    # fail when a benchmark is slower or heavier than the reference
+    if 'compare' in sys.argv[1:]:
+        __regressions = compare(results=__results, baseline=load_baseline(path=BASELINE_PATH), tolerance=TOLERANCE)
+        print('\n'.join(json.dumps(__r) for __r in __regressions))
+        sys.exit(int(bool(__regressions)))
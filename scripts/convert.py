@@ -1,19 +1,39 @@
 import os
 
 import scrapscii.data
+import scrapscii.index
+import scrapscii.profiler
 
 # CONSTANTS ####################################################################
 
 ROOT_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets'))
+INDEX_PATH = os.path.join(ROOT_PATH, 'contents.index')
+
+EXCLUDED_LIST = ['manifest', 'progress'] # bookkeeping, not datasets
+GENERATED_LIST = ['graffiti'] # written straight to parquet, the JSON files there are legacy
 
 # BROWSE #######################################################################
 
-ALL_PATH = [
-    os.path.join(__dp, __f)
-    for __dp, __dn, __fn in os.walk(ROOT_PATH)
-    for __f in __fn if os.path.splitext(__f)[-1] == '.json']
+def list_json(path: str=ROOT_PATH, excluded: list=EXCLUDED_LIST, generated: list=GENERATED_LIST) -> list:
+    __paths = []
+    for __dp, __dn, __fn in os.walk(path):
+        # casting the legacy JSON would overwrite the fresh parquet shards
+        __dn[:] = [__d for __d in __dn if __d not in generated]
+        __paths.extend(
+            os.path.join(__dp, __f)
+            for __f in __fn if os.path.splitext(__f)[-1] == '.json' and not any(__f.startswith(__e) for __e in excluded))
+    return __paths
 
 # CAST #########################################################################
 
-for __p in ALL_PATH:
-    scrapscii.data.cast_json_to_parquet(path=__p)
+def cast_all(paths: list, index: dict=None, raw: bool=False) -> None:
+    # the exact duplicates of the previous files are dropped
+    for __p in paths:
+        scrapscii.data.cast_json_to_parquet(path=__p, index=index, raw=raw)
+
+# MAIN #########################################################################
+
+if __name__ == '__main__':
+    # sample the stacks when SCRAPSCII_PROFILE is set
+    with scrapscii.profiler.profile(path=scrapscii.profiler.PROFILE_PATH, interval=scrapscii.profiler.INTERVAL):
+        cast_all(paths=list_json(path=ROOT_PATH), index=scrapscii.index.load_index(path=INDEX_PATH))
@@ -1,15 +1,31 @@
+import concurrent.futures
+import hashlib
 import json
 import os
 import random
+import sys
 
 import art
+import scrapscii.data
+import scrapscii.glyphs
+import scrapscii.profiler
 import scrapscii.unicode
 
 # META #########################################################################
 
 CAPTION = '`{text}` in {font} font, with {spacing} spacing and {decoration} decoration'
 LABELS = '{font} font, {spacing} spacing, {decoration} decoration'
-PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets/graffiti/{font}.json'))
+PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets/graffiti/{font}.{extension}'))
+MANIFEST_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets/graffiti/manifest-{index:0>3d}-of-{count:0>3d}.json'))
+
+# RANDOM #######################################################################
+
+SEED = 1337
+
+# WORKERS ######################################################################
+
+WORKER_LEN = os.cpu_count() or 1
+EXPORT_JSON = False # the parquet shards are written directly
 
 # SAMPLES ######################################################################
 
@@ -19,31 +35,109 @@ SAMPLES = {
     'special': 'os.path.realpath(\n    os.path.join(os.path.dirname(__file__),\n    "../",\n    "datasets/graffiti/asciiart.json"))',
     'wiki': 'L’art ASCII consiste à réaliser des images uniquement à l\'aide des lettres et caractères spéciaux contenus dans le code ASCII.',}
 
+# RANDOM #######################################################################
+
+def derive_random(seed: int, font: str, sample: str) -> random.Random:
+    # independent from the process, the order of execution and PYTHONHASHSEED
+    __digest = hashlib.sha256('{seed}/{font}/{sample}'.format(seed=seed, font=font, sample=sample).encode('utf-8')).digest()
+    return random.Random(int.from_bytes(__digest[:8], 'big'))
+
+# PARTITION ####################################################################
+
+def partition_fonts(fonts: list, index: int=0, count: int=1) -> list:
+    # round robin over the sorted names, any node can compute its share
+    return [__f for __i, __f in enumerate(sorted(fonts)) if __i % count == index]
+
+# GENERATE #####################################################################
+
+def generate_font(font: str, samples: dict=SAMPLES, seed: int=SEED) -> list:
+    __dataset = []
+    for __key, __text in samples.items():
+        __random = derive_random(seed=seed, font=font, sample=__key)
+        __decorations = __random.sample(sorted(art.params.DECORATIONS_MAP.keys()), 3) + ['no']
+        __spacings = __random.sample(range(0,4), 2)
+        for __d in __decorations:
+            for __s in __spacings:
+                __caption = CAPTION.format(text=__text, font=font, spacing=__s, decoration=__d)
+                # identical to art.text2art, with the glyph blocks cached per font
+                __content = scrapscii.glyphs.text2art(__text, font=font, space=__s, decoration=__d)
+                __labels = LABELS.format(font=font, spacing=__s, decoration=__d)
+                __dataset.append({
+                    'caption': __caption,
+                    'content': __content,
+                    'labels': __labels,
+                    **scrapscii.unicode.annotate(__content),})
+    return __dataset
+
+# EXPORT #######################################################################
+
+def hash_file(path: str) -> str:
+    with open(path, 'rb') as __file:
+        return hashlib.sha256(__file.read()).hexdigest()
+
+def export_font(font: str, path: str=PATH, export_json: bool=EXPORT_JSON, seed: int=SEED) -> tuple:
+    __dataset = generate_font(font=font, seed=seed)
+    __path = path.format(font=font, extension='parquet')
+    # write the shard from the worker, without going through JSON
+    # not deduplicated against the contents index: the rows would depend on the other partitions, and the checksums in the manifest with them
+    scrapscii.data.export_table_as_parquet(table=__dataset, path=__path)
+    # legacy format
+    if export_json:
+        with open(path.format(font=font, extension='json'), 'w') as __file:
+            json.dump(__dataset, __file)
+    return (font, {'path': os.path.basename(__path), 'rows': len(__dataset), 'sha256': hash_file(__path),})
+
+def export_fonts(fonts: list, workers: int=WORKER_LEN, path: str=PATH, export_json: bool=EXPORT_JSON, seed: int=SEED) -> dict:
+    __shards = {}
+    # in process, so that the profiler sees the work
+    if workers <= 1:
+        return dict(sorted(export_font(font=__f, path=path, export_json=export_json, seed=seed) for __f in fonts))
+    # the fonts are independent, spread them over the cores
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as __pool:
+        __futures = [__pool.submit(export_font, font=__f, path=path, export_json=export_json, seed=seed) for __f in fonts]
+        for __future in concurrent.futures.as_completed(__futures):
+            __font, __shard = __future.result()
+            __shards[__font] = __shard
+    # sorted, so that the manifest does not depend on the completion order
+    return dict(sorted(__shards.items()))
+
+def export_partition(index: int=0, count: int=1, workers: int=WORKER_LEN, path: str=PATH, manifest: str=MANIFEST_PATH, export_json: bool=EXPORT_JSON, seed: int=SEED) -> dict:
+    __fonts = partition_fonts(fonts=list(art.params.FONT_MAP.keys()), index=index, count=count)
+    # record everything needed to check or reproduce the partition
+    __manifest = {
+        'seed': seed,
+        'index': index,
+        'count': count,
+        'art': art.__version__,
+        'shards': export_fonts(fonts=__fonts, workers=workers, path=path, export_json=export_json, seed=seed),}
+    with open(manifest.format(index=index, count=count), 'w') as __file:
+        json.dump(__manifest, __file, indent=1)
+    return __manifest
+
+# VERIFY #######################################################################
+
+def verify_fonts(fonts: list, samples: dict=SAMPLES) -> list:
+    __decorations = [None] + sorted(art.params.DECORATIONS_MAP.keys()) + ['no']
+    # compare the cached rendering with art, on all the fonts and decorations used here
+    return [
+        __e
+        for __f in fonts
+        for __e in scrapscii.glyphs.verify_font(font=__f, texts=list(samples.values()), decorations=__decorations, spacings=range(0, 4))]
+
 # MAIN #########################################################################
 
 if __name__ == '__main__':
+    # sample the stacks when SCRAPSCII_PROFILE is set
+    with scrapscii.profiler.profile(path=scrapscii.profiler.PROFILE_PATH, interval=scrapscii.profiler.INTERVAL):
+        # check the glyph cache against art before a full regeneration
+        if 'verify' in sys.argv[1:]:
+            __errors = verify_fonts(fonts=list(art.params.FONT_MAP.keys()))
+            print('\n'.join(str(__e) for __e in __errors))
+            sys.exit(int(bool(__errors)))
 
-    for __font in art.params.FONT_MAP.keys():
-        __dataset = []
-
-        # GENERATE #############################################################
-
-        for __text in SAMPLES.values():
-            __decorations = random.sample(sorted(art.params.DECORATIONS_MAP.keys()), 3) + ['no']
-            __spacings = random.sample(range(0,4), 2)
-            for __d in __decorations:
-                for __s in __spacings:
-                    __caption = CAPTION.format(text=__text, font=__font, spacing=__s, decoration=__d)
-                    __content = art.text2art(__text, font=__font, space=__s, decoration=__d, chr_ignore=True)
-                    __labels = LABELS.format(font=__font, spacing=__s, decoration=__d)
-                    __dataset.append({
-                        'caption': __caption,
-                        'content': __content,
-                        'labels': __labels,
-                        'charsets': ','.join(set(scrapscii.unicode.lookup_section(__c) for __c in __content)),
-                        'chartypes': ','.join(set(scrapscii.unicode.lookup_category(__c) for __c in __content)),})
-
-        # EXPORT ###############################################################
-
-        with open(PATH.format(font=__font), 'w') as __file:
-            json.dump(__dataset, __file)
+        # generate a single partition: graffiti.py <index> <count>
+        __args = [int(__a) for __a in sys.argv[1:3] if __a.isdigit()]
+        __index, __count = __args if len(__args) == 2 else (0, 1)
+        # the profiler only samples this process, so the fonts are rendered here when it is on
+        __workers = 1 if scrapscii.profiler.PROFILE_PATH else WORKER_LEN
+        export_partition(index=__index, count=__count, workers=__workers, path=PATH, manifest=MANIFEST_PATH, export_json=EXPORT_JSON, seed=SEED)
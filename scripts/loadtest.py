@@ -0,0 +1,228 @@
+import hashlib
+import html
+import http.server
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import scrapy.crawler
+import scrapy.utils.project
+
+import scrapscii.spiders.asciiart_spider
+import scrapscii.spiders.twitchquotes_spider
+
+# META #########################################################################
+
+ROOT_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../'))
+
+HOST = '127.0.0.1'
+SEED = 1337
+
+SPIDER_DICT = {
+    'asciiart': scrapscii.spiders.asciiart_spider.AsciiArtSpider,
+    'twitchquotes': scrapscii.spiders.twitchquotes_spider.TwitchQuotesSpider,}
+
+# SERVER #######################################################################
+
+LATENCY_LIST = ['constant', 'uniform', 'exponential', 'lognormal']
+
+LATENCY = 0.1 # seconds, mean of the distribution
+SIGMA = 0.5 # spread of the lognormal distribution
+ERROR_RATE = 0. # share of the responses with a 500 status
+THROTTLE_RATE = 0. # share of the responses with a 429 status
+RETRY_AFTER = 1 # seconds, advertised with the 429 responses
+
+ITEM_LEN = 16 # arts per page
+LINE_LEN = 16 # lines per art
+WIDTH = 64 # characters per line
+
+# glyphs of the synthetic arts, ASCII for asciiart.eu and braille for twitchquotes
+CHARSET_DICT = {
+    'asciiart': ' .,:;\'"`-_=+*#%@/\\|()[]<>^~oO0',
+    'twitchquotes': ''.join(chr(__i) for __i in range(0x2800, 0x2900)),}
+
+# HARNESS ######################################################################
+
+PAGE_LEN = 0 # no limit, all the URLs of the spider
+
+SETTINGS = {
+    'LOG_LEVEL': 'WARNING',
+    'TELNETCONSOLE_ENABLED': False,}
+
+# CONFIG #######################################################################
+
+def init_config(
+    latency: str='exponential',
+    mean: float=LATENCY,
+    sigma: float=SIGMA,
+    errors: float=ERROR_RATE,
+    throttled: float=THROTTLE_RATE,
+    items: int=ITEM_LEN,
+    lines: int=LINE_LEN,
+    width: int=WIDTH,
+    seed: int=SEED,
+) -> dict:
+    return {'latency': latency, 'mean': mean, 'sigma': sigma, 'errors': errors, 'throttled': throttled, 'items': items, 'lines': lines, 'width': width, 'seed': seed,}
+
+# LATENCY ######################################################################
+
+def sample_latency(rng: random.Random, distribution: str='exponential', mean: float=LATENCY, sigma: float=SIGMA) -> float:
+    if mean <= 0.:
+        return 0.
+    if distribution == 'uniform':
+        return rng.uniform(0., 2. * mean)
+    if distribution == 'exponential':
+        return rng.expovariate(1. / mean)
+    if distribution == 'lognormal':
+        # same mean as the other distributions, with a heavy tail
+        return rng.lognormvariate(math.log(mean) - 0.5 * sigma ** 2, sigma)
+    return mean
+
+def sample_status(rng: random.Random, errors: float=ERROR_RATE, throttled: float=THROTTLE_RATE) -> int:
+    __draw = rng.random()
+    if __draw < throttled:
+        return 429
+    if __draw < throttled + errors:
+        return 500
+    return 200
+
+# PAGES ########################################################################
+
+def seed_page(path: str, seed: int=SEED) -> random.Random:
+    # the same URL always serves the same page, across runs and retries
+    return random.Random(int.from_bytes(hashlib.blake2b('{}:{}'.format(seed, path).encode('utf-8'), digest_size=8).digest(), 'big'))
+
+def generate_art(rng: random.Random, charset: str, lines: int=LINE_LEN, width: int=WIDTH) -> str:
+    # ragged lines, like the real arts
+    return '\n'.join(
+        ''.join(rng.choice(charset) for _ in range(rng.randint(1, width))).rstrip() or '.'
+        for _ in range(rng.randint(1, lines)))
+
+def render_asciiart(path: str, config: dict) -> str:
+    __rng = seed_page(path=path, seed=config['seed'])
+    __arts = [
+        '<div><h3>{}</h3><pre>{}</pre></div>'.format(
+            html.escape('Art by {}'.format(__rng.randint(0, 2**16))) if __rng.random() < 0.5 else '',
+            html.escape(generate_art(__rng, charset=CHARSET_DICT['asciiart'], lines=config['lines'], width=config['width'])))
+        for _ in range(config['items'])]
+    return '<!DOCTYPE html>\n<html>\n<body>\n<div class="asciiarts">\n{}\n</div>\n</body>\n</html>\n'.format('\n'.join(__arts))
+
+def render_twitchquotes(path: str, config: dict) -> str:
+    __rng = seed_page(path=path, seed=config['seed'])
+    __cards = [
+        '<article class="twitch-copypasta-card"><h3 class="-title-inner-parent">{}</h3><div>{}</div><span class="-main-text">{}</span></article>'.format(
+            html.escape('Copypasta {}'.format(__rng.randint(0, 2**16))),
+            ''.join('<h4 class="tag-label">Tag {}</h4>'.format(__rng.randint(0, 8)) for _ in range(__rng.randint(0, 3))),
+            html.escape(generate_art(__rng, charset=CHARSET_DICT['twitchquotes'], lines=config['lines'], width=config['width'])))
+        for _ in range(config['items'])]
+    return '<!DOCTYPE html>\n<html>\n<body>\n{}\n</body>\n</html>\n'.format('\n'.join(__cards))
+
+def render_page(path: str, config: dict) -> str:
+    # the listing pages of twitchquotes, everything else is an asciiart.eu category
+    if urllib.parse.urlsplit(path).path.startswith('/copypastas/'):
+        return render_twitchquotes(path=path, config=config)
+    return render_asciiart(path=path, config=config)
+
+# HANDLER ######################################################################
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    # keep-alive, like the real sites
+    protocol_version = 'HTTP/1.1'
+
+    # set on the subclass built by serve
+    config = {}
+    rng = random.Random(SEED)
+    lock = threading.Lock()
+
+    def do_GET(self):
+        # the handlers run in parallel threads, the generator is shared
+        with self.lock:
+            __latency = sample_latency(self.rng, distribution=self.config['latency'], mean=self.config['mean'], sigma=self.config['sigma'])
+            __status = sample_status(self.rng, errors=self.config['errors'], throttled=self.config['throttled'])
+        time.sleep(__latency)
+        __body = render_page(path=self.path, config=self.config).encode('utf-8') if __status == 200 else b''
+        self.send_response(__status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(__body)))
+        if __status == 429:
+            self.send_header('Retry-After', str(RETRY_AFTER))
+        self.end_headers()
+        self.wfile.write(__body)
+
+    def log_message(self, format, *args):
+        # thousands of requests, the crawler stats are enough
+        pass
+
+def serve(config: dict, host: str=HOST, port: int=0) -> None:
+    __handler = type('ConfiguredHandler', (StandInHandler,), {'config': config, 'rng': random.Random(config['seed']), 'lock': threading.Lock()})
+    __server = http.server.ThreadingHTTPServer((host, port), __handler)
+    __server.daemon_threads = True
+    # the parent reads the actual port on the first line
+    print(__server.server_address[1], flush=True)
+    __server.serve_forever()
+
+def start_server(config: dict, host: str=HOST) -> tuple:
+    # separate process, so that the CPU of the server is not counted for the crawler
+    # the package is importable from the repository, whether it is installed or not
+    __env = dict(os.environ, PYTHONPATH=os.pathsep.join(__p for __p in [ROOT_PATH, os.environ.get('PYTHONPATH', '')] if __p))
+    __process = subprocess.Popen([sys.executable, os.path.realpath(__file__), 'serve', json.dumps(config)], stdout=subprocess.PIPE, text=True, env=__env)
+    __port = int(__process.stdout.readline())
+    return (__process, 'http://{}:{}'.format(host, __port))
+
+# HARNESS ######################################################################
+
+def run_spider(spider: str, base_url: str, pages: int=PAGE_LEN, settings: dict=None) -> dict:
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'scrapscii.settings')
+    # the project settings, so that their effect is measured
+    __settings = scrapy.utils.project.get_project_settings()
+    __settings.setdict(SETTINGS, priority='cmdline')
+    __settings.setdict({'CLOSESPIDER_PAGECOUNT': pages}, priority='cmdline')
+    __settings.setdict(settings or {}, priority='cmdline')
+    __process = scrapy.crawler.CrawlerProcess(settings=__settings)
+    __crawler = __process.create_crawler(SPIDER_DICT[spider])
+    __process.crawl(__crawler, base_url=base_url)
+    # CPU of all the threads of the crawler
+    __cpu, __start = time.process_time(), time.perf_counter()
+    __process.start()
+    return report(stats=__crawler.stats.get_stats(), duration=time.perf_counter() - __start, cpu=time.process_time() - __cpu)
+
+def report(stats: dict, duration: float, cpu: float) -> dict:
+    __pages = stats.get('response_received_count', 0)
+    __items = stats.get('item_scraped_count', 0)
+    return {
+        'pages': __pages,
+        'items': __items,
+        'time': duration,
+        'cpu': cpu,
+        'pages/s': __pages / duration if duration else 0.,
+        'items/s': __items / duration if duration else 0.,
+        'cpu/item': cpu / __items if __items else 0.,
+        'retries': stats.get('retry/count', 0),
+        'status': {__k.split('/')[-1]: __v for __k, __v in stats.items() if __k.startswith('downloader/response_status_count/')},}
+
+def run_loadtest(spider: str, config: dict, pages: int=PAGE_LEN, settings: dict=None) -> dict:
+    __server, __url = start_server(config=config)
+    try:
+        __results = run_spider(spider=spider, base_url=__url, pages=pages, settings=settings)
+    finally:
+        __server.terminate()
+        __server.wait()
+    return {'spider': spider, 'config': config, 'settings': settings or {}, **__results}
+
+# MAIN #########################################################################
+
+if __name__ == '__main__':
+    # stand-in server, started by the harness
+    if sys.argv[1:2] == ['serve']:
+        serve(config=json.loads(sys.argv[2]))
+        sys.exit(0)
+
+    # the reactor runs once per process, so a single spider per run
+    __spider = sys.argv[1] if sys.argv[1:] else 'asciiart'
+    print(json.dumps(run_loadtest(spider=__spider, config=init_config(), pages=PAGE_LEN), indent=1))
@@ -1,49 +1,74 @@
-import hashlib
 import io
 import itertools
 import json
-import mimetypes
 import os
-import random
 import subprocess
-import tempfile
-import urllib
+import sys
+import time
 
 import datasets
+import datasets.distributed
 import pyarrow.lib as pl
 import pyarrow.parquet as pq
 import requests
 import tqdm
 
+import scrapscii.cache
 import scrapscii.data
+import scrapscii.hosts
+import scrapscii.images
+import scrapscii.index
+import scrapscii.metrics
+import scrapscii.phash
+import scrapscii.profiler
 import scrapscii.unicode
 
 # CONSTANTS ####################################################################
 
-TIME_MAX = 0.1
+TIME_MAX = scrapscii.images.TIME_MAX
 
-WIDTH_MIN = 16
-WIDTH_MAX = 128
+SIZE_MAX = scrapscii.images.SIZE_MAX
+HEAD_LEN = scrapscii.images.HEAD_LEN
+CHUNK_LEN = 2**14 # bytes
+
+WIDTH_MIN = scrapscii.images.WIDTH_MIN
+WIDTH_MAX = scrapscii.images.WIDTH_MAX
+
+VARIANT_LEN = scrapscii.images.VARIANT_LEN
+
+DISTANCE_MAX = scrapscii.phash.DISTANCE_MAX
 
 TABLE_LEN = 2**4
 SHARD_LEN = 2**8
 TOTAL_LEN = 2**10
 
-SKIPS_LEN = 32
-TABLE_IDX = 11
+# failures that depend on the timeout, the load of the host or the resolver, never cached
+TRANSIENT_LIST = ['connect', 'read', 'resolve', 'response'] # 'response' was written by the older runs
 
-# IO ###########################################################################
+# failures cached by the older runs with checks that were dropped since, retried
+OBSOLETE_LIST = ['extension']
 
-TEMP_PATH = tempfile.mkdtemp()
-DATA_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets/images'))
+CHECKPOINT_LEN = 2**5
+FLUSH_TIME = scrapscii.metrics.FLUSH_TIME
 
-# FILTER BY EXT ################################################################
+# WORKERS ######################################################################
 
-EXTENSION_LIST = ['jpeg', 'jpg', 'png', 'bmp', 'webp', 'tiff', 'tif', 'gif']
+WORKER_RANK = int(os.environ.get('RANK', 0))
+WORKER_LEN = int(os.environ.get('WORLD_SIZE', 1))
 
-# CHECK ########################################################################
+# IO ###########################################################################
 
-CORRUPTED_HASH = ['4dcb57651a75abfd07fb36c70c6c5108c49bdb34']
+CACHE_PATH = scrapscii.cache.CACHE_PATH
+CACHE_MAX = scrapscii.cache.CACHE_MAX
+DATA_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../', 'datasets/images'))
+PROGRESS_PATH = os.path.join(DATA_PATH, 'progress.json')
+CONTENTS_PATH = os.path.join(os.path.dirname(DATA_PATH), 'contents.index') # shared with convert
+MANIFEST_PATH = os.path.join(DATA_PATH, 'manifest.json')
+METRICS_PATH = os.path.join(DATA_PATH, 'metrics.jsonl')
+PROMETHEUS_PATH = os.path.join(DATA_PATH, 'metrics.prom')
+PHASH_PATH = os.path.join(DATA_PATH, 'images.phash')
+
+# CHECK ########################################################################
 
 def is_valid_response(response: requests.models.Response) -> bool:
     return (
@@ -51,129 +76,260 @@ def is_valid_response(response: requests.models.Response) -> bool:
         and type(response) == requests.models.Response
         and response.status_code == 200)
 
-def is_valid_extension(extension: str, accepted: list=EXTENSION_LIST) -> bool:
-    return (
-        bool(extension)
-        and type(extension) == str
-        and extension.lower().strip('.') in accepted)
-
-def is_valid_image(image: bytes) -> bool:
-    return (
-        bool(image)
-        and type(image) == bytes
-        and not hashlib.sha1(image).hexdigest() in CORRUPTED_HASH)
-
-def is_valid_ascii(ascii: str, width: int=WIDTH_MIN) -> bool:
-    return (
-        bool(ascii)
-        and type(ascii) == str
-        and len(ascii) >= width
-        and not 'error' in ascii.lower())
-
 # DOWNLOAD #####################################################################
 
-def download_image(url: str, timeout: int=1) -> requests.models.Response:
-    __response = None
-    # retrieve the image content as bytes
+def classify_error(error: Exception) -> str:
+    # the order matters, the timeouts are also connection errors
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return 'connect'
+    if isinstance(error, (requests.exceptions.ReadTimeout, requests.exceptions.ChunkedEncodingError)):
+        return 'read'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        __message = str(error).lower()
+        # the resolver could not answer in time, the name may still exist
+        if 'temporary failure in name resolution' in __message or 'eai_again' in __message or 'errno -3' in __message:
+            return 'resolve'
+        if 'resolve' in __message or 'getaddrinfo' in __message or 'name or service' in __message:
+            return 'dns'
+        return 'connect'
+    return 'request'
+
+def download_image(url: str, timeout: float=1) -> tuple:
+    __response, __error = None, ''
+    # retrieve the headers only, the body is streamed later on
     try:
-        __response = requests.get(url, timeout=timeout)
-    # ignore exceptions
-    except:
-        __response = None
+        __response = requests.get(url, timeout=timeout, stream=True)
+    # sort the failures by class
+    except Exception as __e:
+        __response, __error = None, classify_error(__e)
     # default
-    return __response
+    return (__response, __error)
 
-def parse_content(response: requests.models.Response) -> bytes:
+def parse_content(response: requests.models.Response, size: int=SIZE_MAX, head: int=HEAD_LEN, chunk: int=CHUNK_LEN) -> tuple:
     __bytes = b''
-    if is_valid_response(response):
-        __bytes = response.content
-    return __bytes
-
-def parse_extension(response: requests.models.Response) -> str:
-    __extension = ''
-    # parse the header
-    if is_valid_response(response):
-        __headers = response.headers.get('content-type', '')
-        __extension = mimetypes.guess_extension(__headers)
-    # parse the URL
-    if not is_valid_extension(__extension):
-        __path = urllib.parse.urlparse(response.url).path
-        __filename = __path.split('/')[-1]
-        __extension = os.path.splitext(__filename)[-1]
-    # favor the information coming from the header
-    return __extension
-
-def format_path(url: str, extension: str, temp: str=TEMP_PATH) -> str:
-    # reduce the filename to a fixed size
-    __hash = hashlib.sha1(url.encode('utf-8')).hexdigest()
-    # safe path
-    return os.path.join(temp, __hash + '.' + extension.strip('.'))
-
-def export_image(data: bytes, path: str) -> None:
-    with open(path, 'b+w') as __file:
-        __file.write(data)
+    __chunks = response.iter_content(chunk_size=chunk)
+    # read just enough to identify the format
+    for __c in __chunks:
+        __bytes += __c
+        if len(__bytes) >= head:
+            break
+    __magic = scrapscii.images.parse_magic(__bytes)
+    if not __magic:
+        return (b'', '', 'magic')
+    # stream the rest of the body, within the size budget
+    __buffer = io.BytesIO(__bytes)
+    __buffer.seek(0, io.SEEK_END)
+    for __c in __chunks:
+        __buffer.write(__c)
+        if __buffer.tell() > size:
+            return (b'', __magic, 'size')
+    return (__buffer.getvalue(), __magic, '')
+
+def reject_image(url: str, reason: str, path: str=CACHE_PATH) -> tuple:
+    # remember the failure so that the URL is not retried
+    scrapscii.cache.store_failure(url=url, reason=reason, path=path)
+    return ('', reason, False)
+
+def fetch_image(url: str, timeout: float=1, size: int=SIZE_MAX, path: str=CACHE_PATH, hosts: dict=None) -> tuple:
+    __hosts = {} if hosts is None else hosts
+    # look for a previous download, either the image or the reason it was rejected
+    __entry = scrapscii.cache.find_entry(url=url, path=path)
+    if __entry:
+        scrapscii.cache.touch_entry(__entry)
+        if not scrapscii.cache.is_failure(__entry):
+            return (__entry, '', True)
+        # the transient and obsolete failures cached by the older runs are retried
+        __reason = scrapscii.cache.read_failure(__entry)
+        if __reason not in TRANSIENT_LIST + OBSOLETE_LIST:
+            return ('', __reason, True)
+        scrapscii.cache.remove_entry(__entry)
+    # skip the hosts that keep failing, without caching since it is temporary
+    __host = scrapscii.hosts.parse_host(url)
+    if not scrapscii.hosts.is_available(__hosts, host=__host):
+        return ('', 'host', False)
+    # download the headers of the image, with a timeout adapted to the host
+    __timeout = scrapscii.hosts.compute_timeout(__hosts, host=__host, default=timeout)
+    __response, __error = download_image(url, timeout=__timeout)
+    try:
+        # the host did not answer properly
+        if __error:
+            scrapscii.hosts.record_failure(__hosts, host=__host, error=__error)
+            # the timeouts depend on the adaptive timeout, they may succeed later
+            return ('', __error, False) if __error in TRANSIENT_LIST else reject_image(url=url, reason=__error, path=path)
+        # the host answered, but only server errors count against it
+        if __response.status_code >= 500 or __response.status_code == 429:
+            scrapscii.hosts.record_failure(__hosts, host=__host, error='status')
+            # throttled or overloaded, the URL itself may be fine
+            return ('', 'status', False)
+        scrapscii.hosts.record_success(__hosts, host=__host, latency=__response.elapsed.total_seconds())
+        # reject as early as possible, before the body is downloaded
+        if not is_valid_response(__response):
+            return reject_image(url=url, reason='status', path=path)
+        if not scrapscii.images.is_valid_type(__response.headers.get('content-type', '')):
+            return reject_image(url=url, reason='type', path=path)
+        if not scrapscii.images.is_valid_length(__response.headers.get('content-length', ''), size=size):
+            return reject_image(url=url, reason='length', path=path)
+        # the magic bytes decide the format, the headers and the URL are often wrong
+        try:
+            __bytes, __magic, __reason = parse_content(__response, size=size)
+        # the connection broke while streaming
+        except Exception as __e:
+            return ('', classify_error(__e), False)
+        if __reason:
+            return reject_image(url=url, reason=__reason, path=path)
+        if not scrapscii.images.is_valid_image(__bytes):
+            return reject_image(url=url, reason='image', path=path)
+        # save to disk, with the extension matching the actual format
+        return (scrapscii.cache.store_image(url=url, data=__bytes, extension=__magic, path=path), '', False)
+    # release the connection, even when the body was not consumed
+    finally:
+        if __response is not None:
+            __response.close()
 
 # STATS ########################################################################
 
-def init_stats(
-    index: int=0,
-    saved: int=0,
-    skipped: int=0,
-    valid: int=0,
-    response: int=0,
-    extension: int=0,
-    image: int=0,
-    asciiart: int=0
-) -> dict:
-    return {
-        'index': index,
-        'total': max(saved, skipped),
-        'saved': saved,
-        'skipped': skipped,
-        'valid': valid,
-        'invalid': {
-            'response': response,
-            'extension': extension,
-            'image': image,
-            'asciiart': asciiart,},}
-
-def update_stats(
-    stats: dict,
-    index: int=0,
-    saved: int=0,
-    skipped: int=0,
-    valid: int=0,
-    response: int=0,
-    extension: int=0,
-    image: int=0,
-    asciiart: int=0
-) -> dict:
-    return {
-        'index': stats['index'] + index,
-        'total': stats['total'] + skipped + valid + response + extension + image + asciiart,
-        'saved': saved or stats['saved'], # keep the latest
-        'skipped': stats['skipped'] + skipped,
-        'valid': stats['valid'] + valid,
-        'invalid': {
-            'response': stats['invalid']['response'] + response,
-            'extension': stats['invalid']['extension'] + extension,
-            'image': stats['invalid']['image'] + image,
-            'asciiart': stats['invalid']['asciiart'] + asciiart,},}
+REJECTION_LIST = ['host', 'dns', 'resolve', 'connect', 'read', 'request', 'status', 'type', 'length', 'magic', 'size', 'image', 'decode', 'duplicate', 'asciiart']
+STAGE_LIST = ['download', 'deduplicate', 'render', 'annotation', 'export']
+
+def init_stats(data: dict=None) -> dict:
+    __stats = scrapscii.metrics.init_registry(
+        counters=['samples', 'valid', 'rows', 'cached'] + ['rejected_' + __r for __r in REJECTION_LIST],
+        gauges=['index', 'saved'],
+        histograms=STAGE_LIST)
+    # resume from a previous run, without the counters that were renamed since
+    __data = dict(data or {})
+    __data['counters'] = {__n: __v for __n, __v in __data.get('counters', {}).items() if __n in __stats['counters']}
+    return scrapscii.metrics.restore_registry(data=__data, registry=__stats)
+
+def count_sample(stats: dict, reason: str='') -> None:
+    # each sample is either valid or rejected for a single reason
+    scrapscii.metrics.increment(stats, 'samples')
+    scrapscii.metrics.increment(stats, 'rejected_' + reason if reason else 'valid')
+    scrapscii.metrics.tick(stats)
 
 def format_stats(stats: dict) -> str:
-    return 'index={index} total={total} saved={saved} skipped={skipped} valid={valid} invalid={invalid} (response={response} extension={extension} image={image} asciiart={asciiart})'.format(
-        index=stats['index'],
-        total=stats['total'],
-        saved=stats['saved'],
-        skipped=stats['skipped'],
-        valid=stats['valid'],
-        invalid=sum([__v for __v in stats['invalid'].values()]),
-        response=stats['invalid']['response'],
-        extension=stats['invalid']['extension'],
-        image=stats['invalid']['image'],
-        asciiart=stats['invalid']['asciiart'],)
-
-# CLEAR ########################################################################
+    __counters = stats['counters']
+    __invalid = {__n[9:]: __v for __n, __v in __counters.items() if __n.startswith('rejected_')}
+    return 'index={index} total={total} saved={saved} valid={valid} rows={rows} cached={cached} rate={rate:.2f}/s invalid={invalid} ({reasons})'.format(
+        index=stats['gauges']['index'],
+        total=__counters['samples'],
+        saved=stats['gauges']['saved'],
+        valid=__counters['valid'],
+        rows=__counters['rows'],
+        cached=__counters['cached'],
+        rate=scrapscii.metrics.rate(stats),
+        invalid=sum(__invalid.values()),
+        reasons=' '.join('{name}={value}'.format(name=__n, value=__v) for __n, __v in __invalid.items()),)
+
+def flush_stats(stats: dict, pbar: tqdm.tqdm=None, metrics_path: str=METRICS_PATH, prometheus_path: str=PROMETHEUS_PATH) -> None:
+    # the formatting is only done at the flush interval, not for every sample
+    if pbar is not None:
+        pbar.set_postfix_str(format_stats(stats), refresh=True)
+    scrapscii.metrics.flush(stats, jsonl_path=metrics_path, prometheus_path=prometheus_path)
+
+# PROGRESS #####################################################################
+
+def init_progress(stats: dict=None, table: list=None, state: dict=None) -> dict:
+    __stats = stats or init_stats()
+    return {
+        'offset': __stats['counters']['samples'], # samples consumed from the stream
+        'index': __stats['gauges']['index'], # next shard
+        'stats': scrapscii.metrics.export_registry(__stats),
+        'table': list(table or []), # rows consumed but not exported yet
+        'state': state,} # state of the dataset iterator, if supported
+
+def find_shard(path: str=DATA_PATH) -> int:
+    __index = 0
+    # the first shard that is not on disk yet
+    while os.path.isfile(os.path.join(path, '{index:0>4d}.parquet'.format(index=__index))):
+        __index += 1
+    return __index
+
+def load_progress(path: str=PROGRESS_PATH) -> dict:
+    # a fresh run appends after the shards already on disk
+    __progress = init_progress(stats=init_stats(data={'gauges': {'index': find_shard(path=os.path.dirname(path))}}))
+    if os.path.isfile(path):
+        with open(path, 'r') as __file:
+            __progress.update(json.load(__file))
+    return __progress
+
+def save_progress(progress: dict, path: str=PROGRESS_PATH) -> None:
+    __temp = path + '.tmp'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(__temp, 'w') as __file:
+        json.dump(progress, __file)
+    # never leave a truncated progress file behind
+    os.replace(__temp, path)
+
+def checkpoint(stats: dict, table: list, dataset: iter=None, path: str=PROGRESS_PATH) -> None:
+    # only the iterable datasets from HF can save their position
+    __state = dataset.state_dict() if hasattr(dataset, 'state_dict') else None
+    save_progress(progress=init_progress(stats=stats, table=table, state=__state), path=path)
+
+def checkpoint_samples(samples: iter, callback: callable, checkpoint_len: int=CHECKPOINT_LEN) -> iter:
+    for __i, __sample in enumerate(samples):
+        yield __sample
+        # the sample is fully processed and the next one is not pulled from the stream yet
+        if (__i + 1) % checkpoint_len == 0:
+            callback()
+
+def resume_dataset(dataset: iter, progress: dict) -> iter:
+    # restore the position in the stream directly, without iterating over the samples
+    if progress['state'] and hasattr(dataset, 'load_state_dict'):
+        dataset.load_state_dict(progress['state'])
+        return dataset
+    # otherwise skip at the source, which still avoids downloading the images
+    if progress['offset'] and hasattr(dataset, 'skip'):
+        return dataset.skip(progress['offset'])
+    return itertools.islice(dataset, progress['offset'], None)
+
+# WORKERS ######################################################################
+
+def format_worker_path(path: str=DATA_PATH, rank: int=WORKER_RANK, workers: int=WORKER_LEN) -> str:
+    # a single worker keeps the flat layout
+    if workers <= 1:
+        return path
+    # each worker writes its shards and progress in its own namespace
+    return os.path.join(path, '{rank:0>3d}-of-{workers:0>3d}'.format(rank=rank, workers=workers))
+
+def split_dataset(dataset: iter, rank: int=WORKER_RANK, workers: int=WORKER_LEN) -> iter:
+    if workers <= 1:
+        return dataset
+    # whole source shards when they divide evenly, otherwise every n-th sample (index mod n)
+    if hasattr(dataset, 'n_shards'):
+        return datasets.distributed.split_dataset_by_node(dataset, rank=rank, world_size=workers)
+    return itertools.islice(dataset, rank, None, workers)
+
+def split_total(total: int=TOTAL_LEN, rank: int=WORKER_RANK, workers: int=WORKER_LEN) -> int:
+    # the first workers take the remainder
+    return total // workers + int(rank < total % workers)
+
+def launch_workers(workers: int=WORKER_LEN, args: list=[]) -> list:
+    __processes = []
+    # run the same script with a distinct rank in each process
+    for __r in range(workers):
+        __env = dict(os.environ, RANK=str(__r), WORLD_SIZE=str(workers))
+        __processes.append(subprocess.Popen([sys.executable, os.path.realpath(__file__)] + list(args), env=__env))
+    # wait for all of them
+    return [__p.wait() for __p in __processes]
+
+def merge_manifests(path: str=DATA_PATH, manifest: str=MANIFEST_PATH) -> dict:
+    __manifest = {'rows': 0, 'shards': [], 'workers': {},}
+    # gather the shards of all the workers
+    for __p in sorted(list_files(path, extension='.parquet')):
+        if __p.endswith('.parquet'):
+            __rows = pq.ParquetFile(__p).metadata.num_rows
+            __manifest['rows'] += __rows
+            __manifest['shards'].append({'path': os.path.relpath(__p, path), 'rows': __rows,})
+    # gather the progress of each worker
+    for __p in sorted(list_files(path, extension='progress.json')):
+        if __p.endswith('progress.json'):
+            __manifest['workers'][os.path.relpath(os.path.dirname(__p), path)] = load_progress(__p)['stats']
+    # export
+    save_progress(progress=__manifest, path=manifest)
+    return __manifest
+
+# FILES ########################################################################
 
 def list_files(path: str, extension: str='') -> list:
     return [
@@ -181,63 +337,44 @@ def list_files(path: str, extension: str='') -> list:
         for __dp, __dn, __fn in os.walk(path)
         for __f in __fn if extension in __f]
 
-def clear_dir(path: str) -> None:
-    __paths = list_files(path)
-    for __p in __paths:
-        os.remove(__p)
-
-# RANDOM #######################################################################
-
-def random_options(width_min: int=WIDTH_MIN, width_max: int=WIDTH_MAX) -> list:
-    # choose the config randomly
-    __width = '--width {width}'.format(width=random.randint(width_min, width_max))
-    __braille = '--braille' if random.choice([True, False]) else ''
-    __color = '--color' if random.choice([True] + 9 * [False]) else ''
-    __complex = '--complex' if random.choice([True, False]) else ''
-    __dither = '--dither' if __braille and random.choice([True, False]) else ''
-    __grayscale = '--grayscale' if random.choice([True] + 9 * [False]) else ''
-    __negative = '--negative' if random.choice([True] + 9 * [False]) else ''
-    __threshold = '--threshold {threshold}'.format(threshold=random.randint(96, 160)) if __braille and random.choice([True] + 4 * [False]) else ''
-    # chain all the options
-    return [__width, __braille, __color, __complex, __dither, __grayscale, __negative, __threshold]
-
-def format_args(options: list) -> list:
-    return list(itertools.chain.from_iterable(__o.split(' ') for __o in options if __o))
-
-def format_labels(options: list) -> list:
-    return [__o.strip('--') for __o in options if __o]
-
 # EXPORT #######################################################################
 
-def export_table(table: iter, index: int, path: str=DATA_PATH) -> None:
+def export_table(table: iter, index: int, path: str=DATA_PATH, contents: dict=None) -> bool:
     __path = os.path.join(path, '{index:0>4d}.parquet'.format(index=index))
-    scrapscii.data.export_table_as_parquet(table=table, path=__path)
+    os.makedirs(path, exist_ok=True)
+    # the shard was written before the last checkpoint could be saved
+    if os.path.isfile(__path):
+        return False
+    # the exact duplicates of the contents already in the corpus are dropped
+    scrapscii.data.export_table_as_parquet(table=table, path=__path, index=contents)
+    return True
 
 # CONVERT ######################################################################
 
-def convert_image(path: str, options: list, timeout: int=TIME_MAX) -> str:
-    __ascii = ''
-    # run binary tool
-    try:
-        __process = subprocess.run(['ascii-image-converter'] + options + [path], stdout=subprocess.PIPE, timeout=timeout)
-        __ascii = __process.stdout.decode('utf-8')
-    # timeout longer executions
-    except:
-        __ascii = ''
-    # default
-    return __ascii
-
 def convert_shard(
     dataset: iter,
     table: iter=[],
-    stats: dict=init_stats(),
+    stats: dict=None,
     table_len: int=TABLE_LEN,
     shard_len: int=SHARD_LEN,
+    variant_len: int=VARIANT_LEN,
     width_min: int=WIDTH_MIN,
     width_max: int=WIDTH_MAX,
-    temp_path: str=TEMP_PATH,
+    cache_path: str=CACHE_PATH,
+    cache_max: int=CACHE_MAX,
     data_path: str=DATA_PATH,
     time_max: int=TIME_MAX,
+    size_max: int=SIZE_MAX,
+    source: iter=None,
+    hosts: dict=None,
+    index: dict=None,
+    phash_path: str=PHASH_PATH,
+    contents: dict=None,
+    checkpoint_len: int=CHECKPOINT_LEN,
+    progress_path: str=PROGRESS_PATH,
+    flush_time: float=FLUSH_TIME,
+    metrics_path: str=METRICS_PATH,
+    prometheus_path: str=PROMETHEUS_PATH,
 ) -> tuple:
     # current table
     __table = list(table)
@@ -247,98 +384,150 @@ def convert_shard(
 
     # track progress
     __pbar = tqdm.tqdm(__iter, total=shard_len, smoothing=0.0)
-    __stats = dict(stats)
+    __stats = stats or init_stats()
+
+    # latency and failures of each host, shared by all the samples
+    __hosts = {} if hosts is None else hosts
+
+    # perceptual hashes of the images already converted
+    __index = scrapscii.phash.init_index() if index is None else index
+
+    # last scan of the download cache
+    __evicted = time.time()
+
+    # save the progress regularly, including the rows that are not exported yet
+    __samples = checkpoint_samples(__pbar, callback=lambda: checkpoint(stats=__stats, table=__table, dataset=source, path=progress_path), checkpoint_len=checkpoint_len)
 
     # iterate over the samples
-    for __sample in __pbar:
+    for __sample in __samples:
+
+        # report the metrics regularly
+        if scrapscii.metrics.should_flush(__stats, interval=flush_time):
+            flush_stats(stats=__stats, pbar=__pbar, metrics_path=metrics_path, prometheus_path=prometheus_path)
 
         # parse the URL
         __url = __sample['url.txt']
 
-        # download image from URL
-        __response = download_image(__url, timeout=time_max)
-        if not is_valid_response(__response):
-            __stats = update_stats(stats=__stats, response=1)
-            __pbar.set_postfix_str(format_stats(__stats), refresh=True)
+        # download the image, unless it is already cached
+        __time = time.perf_counter()
+        __path, __reason, __cached = fetch_image(url=__url, timeout=time_max, size=size_max, path=cache_path, hosts=__hosts)
+        __time = scrapscii.metrics.measure(__stats, 'download', __time)
+        scrapscii.metrics.increment(__stats, 'cached', int(__cached))
+        if __reason:
+            count_sample(__stats, reason=__reason)
             continue
 
-        # parse the extension
-        __extension = parse_extension(__response)
-        if not is_valid_extension(__extension):
-            __stats = update_stats(stats=__stats, extension=1)
-            __pbar.set_postfix_str(format_stats(__stats), refresh=True)
+        # skip the near duplicates before the costly rendering
+        __key = scrapscii.phash.compute_key(scrapscii.cache.hash_url(__url))
+        __value = scrapscii.phash.hash_image(path=__path)
+        __reason = scrapscii.phash.check_hash(__index, value=__value, key=__key)
+        __time = scrapscii.metrics.measure(__stats, 'deduplicate', __time)
+        # the bytes are corrupted, replace the image with a failure so that it is not decoded again
+        if __reason == 'decode':
+            scrapscii.cache.remove_entry(__path)
+            scrapscii.cache.store_failure(url=__url, reason=__reason, path=cache_path)
+        if __reason:
+            count_sample(__stats, reason=__reason)
             continue
 
-        # parse the image content
-        __bytes = parse_content(__response)
-        if not is_valid_image(__bytes):
-            __stats = update_stats(stats=__stats, image=1)
-            __pbar.set_postfix_str(format_stats(__stats), refresh=True)
+        # choose several configs randomly, the image is downloaded only once
+        __variants = scrapscii.images.random_variants(count=variant_len, width_min=width_min, width_max=width_max)
+
+        # choose the captions among the synthetic text
+        __captions = scrapscii.images.random_captions(captions=__sample['syn.json']['syn_text'], count=len(__variants))
+
+        # render each variant as a separate row
+        __rows = 0
+        for __options, __caption in zip(__variants, __captions):
+            __args = scrapscii.images.format_args(__options)
+            __labels = scrapscii.images.format_labels(__options)
+
+            # convert the image to ASCII art
+            __time = time.perf_counter()
+            __content = scrapscii.images.convert_image(path=__path, options=__args, timeout=time_max)
+            __time = scrapscii.metrics.measure(__stats, 'render', __time)
+            if not scrapscii.images.is_valid_ascii(__content):
+                continue
+
+            # add a row
+            __rows += 1
+            __table.append({
+                'caption': __caption,
+                'content': __content,
+                'labels': ','.join(__labels),
+                **scrapscii.unicode.annotate(__content),})
+            __time = scrapscii.metrics.measure(__stats, 'annotation', __time)
+
+        # the sample is valid as long as one of its variants is
+        if not __rows:
+            count_sample(__stats, reason='asciiart')
             continue
 
-        # save to disk
-        __path = format_path(url=__url, extension=__extension, temp=temp_path)
-        export_image(data=__bytes, path=__path)
-
-        # choose the config randomly
-        __options = random_options(width_min=width_min, width_max=width_max)
-        __args = format_args(__options)
-        __labels = format_labels(__options)
-
-        # choose a caption among the synthetic text
-        __choice = random.randint(0, len(__sample['syn.json']['syn_text']) - 1)
-        __caption = __sample['syn.json']['syn_text'][__choice]
-
-        # convert the image to ASCII art
-        __content = convert_image(path=__path, options=__args, timeout=time_max)
-        if not is_valid_ascii(__content):
-            __stats = update_stats(stats=__stats, asciiart=1)
-            __pbar.set_postfix_str(format_stats(__stats), refresh=True)
-            continue
+        # the image is part of the dataset now, its copies are duplicates
+        scrapscii.phash.register_hash(__index, value=__value, key=__key, path=phash_path)
 
-        # add a row
-        __stats = update_stats(stats=__stats, valid=1)
-        __pbar.set_postfix_str(format_stats(__stats), refresh=True)
-        __table.append({
-            'caption': __caption,
-            'content': __content,
-            'labels': ','.join(__labels),
-            'charsets': ','.join(set(scrapscii.unicode.lookup_section(__c) for __c in __content)),
-            'chartypes': ','.join(set(scrapscii.unicode.lookup_category(__c) for __c in __content)),})
+        # update the stats
+        count_sample(__stats)
+        scrapscii.metrics.increment(__stats, 'rows', __rows)
 
         # chunk the dataset into shards
         if len(__table) >= table_len:
-            # export as parquet
-            export_table(table=__table, index=__stats['index'], path=data_path)
+            # export as parquet, atomically and only once
+            __time = time.perf_counter()
+            if not export_table(table=__table, index=__stats['gauges']['index'], path=data_path, contents=contents):
+                __pbar.write(f"shard {__stats['gauges']['index']} already exists, keeping it")
+            __time = scrapscii.metrics.measure(__stats, 'export', __time)
             # refresh the stats
-            __stats = update_stats(stats=__stats, index=1, saved=__stats['total'])
-            __pbar.set_postfix_str(format_stats(__stats), refresh=True)
-            __pbar.write(f"{__stats['total']}")
+            scrapscii.metrics.assign(__stats, 'index', __stats['gauges']['index'] + 1)
+            scrapscii.metrics.assign(__stats, 'saved', __stats['counters']['samples'])
+            __pbar.write(f"{__stats['counters']['samples']}")
             # clear the table
             __table = []
+            # the rows are on disk, move the checkpoint forward
+            checkpoint(stats=__stats, table=__table, dataset=source, path=progress_path)
+            # keep the cache within its disk budget, scanning it once in a while
+            if scrapscii.cache.should_evict(last=__evicted):
+                scrapscii.cache.evict_entries(path=cache_path, budget=cache_max)
+                __evicted = time.time()
+
+    # save the remainder for the next run
+    checkpoint(stats=__stats, table=__table, dataset=source, path=progress_path)
+
+    # report the final state
+    flush_stats(stats=__stats, pbar=__pbar, metrics_path=metrics_path, prometheus_path=prometheus_path)
 
     # return the remainder
     return (__stats, __table)
 
-# MAIN #########################################################################
+# RUN ##########################################################################
+
+def run_worker(
+    rank: int=WORKER_RANK,
+    workers: int=WORKER_LEN,
+    data_path: str=DATA_PATH,
+    cache_path: str=CACHE_PATH,
+    cache_max: int=CACHE_MAX,
+) -> dict:
+    # each worker has its own namespace
+    __data_path = format_worker_path(path=data_path, rank=rank, workers=workers)
+    __progress_path = os.path.join(__data_path, os.path.basename(PROGRESS_PATH))
+
+    # resume from the latest checkpoint, if any
+    __progress = load_progress(__progress_path)
 
-if __name__ == '__main__':
     # init the stats
-    __stats = init_stats(index=TABLE_IDX)
+    __stats = init_stats(data=__progress['stats'])
 
-    # init the table
-    __table = []
+    # init the table with the rows that were not exported yet
+    __table = __progress['table']
 
-    # init the dataset
+    # init the dataset, restricted to the slice of this worker and at the position of the latest checkpoint
     __dataset = datasets.load_dataset('apple/DataCompDR-12M', split='train', cache_dir='~/.cache/huggingface/datasets', streaming=True)
-    __iter = itertools.islice(__dataset, 0, TOTAL_LEN)
-
-    # skip samples that are already processed
-    __skip = tqdm.tqdm(itertools.islice(__iter, 0, SKIPS_LEN), total=SKIPS_LEN, smoothing=0.0)
-    for _ in __skip:
-        __stats = update_stats(stats=__stats, skipped=1)
-    # update the latest checkpoint
-    __stats = update_stats(stats=__stats, saved=__stats['total'])
+    __dataset = split_dataset(__dataset, rank=rank, workers=workers)
+    __dataset = resume_dataset(__dataset, progress=__progress)
+    __total = split_total(total=TOTAL_LEN, rank=rank, workers=workers)
+    __iter = itertools.islice(__dataset, 0, max(0, __total - __progress['offset']))
+
     # export a shard
     __stats, __table = convert_shard(
         dataset=__iter,
@@ -346,10 +535,40 @@ if __name__ == '__main__':
         stats=__stats,
         table_len=TABLE_LEN,
         shard_len=SHARD_LEN,
+        variant_len=VARIANT_LEN,
         width_min=WIDTH_MIN,
         width_max=WIDTH_MAX,
-        temp_path=TEMP_PATH,
-        data_path=DATA_PATH,
-        time_max=TIME_MAX,)
-    # remove the temp downloads (images)
-    clear_dir(TEMP_PATH)
+        cache_path=cache_path,
+        cache_max=cache_max,
+        data_path=__data_path,
+        time_max=TIME_MAX,
+        size_max=SIZE_MAX,
+        source=__dataset,
+        index=scrapscii.phash.load_index(path=data_path, distance=DISTANCE_MAX),
+        phash_path=os.path.join(__data_path, os.path.basename(PHASH_PATH)),
+        contents=scrapscii.index.load_index(path=CONTENTS_PATH),
+        checkpoint_len=CHECKPOINT_LEN,
+        progress_path=__progress_path,
+        flush_time=FLUSH_TIME,
+        metrics_path=os.path.join(__data_path, os.path.basename(METRICS_PATH)),
+        prometheus_path=os.path.join(__data_path, os.path.basename(PROMETHEUS_PATH)),)
+    # keep the downloads for later runs, within the disk budget
+    scrapscii.cache.evict_entries(path=cache_path, budget=cache_max)
+    # the remainder is saved in the progress file
+    return __stats
+
+# MAIN #########################################################################
+
+if __name__ == '__main__':
+    # merge the outputs of all the workers into a single manifest
+    if 'merge' in sys.argv[1:]:
+        merge_manifests(path=DATA_PATH, manifest=MANIFEST_PATH)
+        sys.exit(0)
+
+    # spawn one process per worker on this machine
+    if 'launch' in sys.argv[1:]:
+        sys.exit(max(launch_workers(workers=WORKER_LEN), default=0))
+
+    # process the slice of this worker, sampling its stacks when SCRAPSCII_PROFILE is set
+    with scrapscii.profiler.profile(path=scrapscii.profiler.PROFILE_PATH and format_worker_path(path=scrapscii.profiler.PROFILE_PATH, rank=WORKER_RANK, workers=WORKER_LEN), interval=scrapscii.profiler.INTERVAL):
+        run_worker(rank=WORKER_RANK, workers=WORKER_LEN, data_path=DATA_PATH, cache_path=CACHE_PATH, cache_max=CACHE_MAX)
@@ -0,0 +1,39 @@
+import pyarrow as pa
+import pytest
+
+import scrapscii.canonical
+
+# FIXTURES #####################################################################
+
+CASE_LIST = [
+    # (original, canonical)
+    ('  /\\\r\n (  )\r\n', '  /\\\n (  )'),
+    ('a\rb\rc', 'a\nb\nc'),
+    ('a \r\n\r\nb', 'a\n\nb'),
+    ('x 　\ny\t\x0b\x0c\nz ', 'x\ny\nz'),
+    ('a⠀', 'a⠀'), # braille blank is part of the art
+    ('\n\n\n  indented\n\n', '  indented'),
+    ('\n \n\t\n', ''),
+    ('', ''),
+    ('no change', 'no change'),]
+
+# TEXT #########################################################################
+
+@pytest.mark.parametrize('text, expected', CASE_LIST)
+def test_canonicalize_text(text, expected):
+    assert scrapscii.canonical.canonicalize_text(text) == expected
+
+# ARROW ########################################################################
+
+def test_canonicalize_array_matches_text():
+    __texts = [__t for __t, _ in CASE_LIST]
+    assert scrapscii.canonical.canonicalize_array(pa.array(__texts)).to_pylist() == [scrapscii.canonical.canonicalize_text(__t) for __t in __texts]
+
+def test_canonicalize_array_keeps_nulls():
+    assert scrapscii.canonical.canonicalize_array(pa.array(['a ', None])).to_pylist() == ['a', None]
+
+def test_canonicalize_table_keeps_raw():
+    __table = pa.table({'content': ['a \r\n']})
+    __table = scrapscii.canonical.canonicalize_table(__table, column='content', raw='raw')
+    assert __table.column('content').to_pylist() == ['a']
+    assert __table.column('raw').to_pylist() == ['a \r\n']
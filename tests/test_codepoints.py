@@ -0,0 +1,44 @@
+import pytest
+
+import scrapscii.data
+
+# FIXTURES #####################################################################
+
+BMP_LIST = ['/\\_/\\\n( o.o )\n > ^ <', '⠀⣿⡇\n⠸⠿', '']
+ASTRAL_LIST = ['🐱🐱\n🐱', 'a\U0001d11eb', '']
+
+def export_and_load(texts: list, path: str, grid: bool=False) -> dict:
+    scrapscii.data.export_table_as_codepoints(table=[{'content': __t} for __t in texts], path=path, grid=grid)
+    return scrapscii.data.load_codepoints(path=path)
+
+# ROUND TRIP ###################################################################
+
+@pytest.mark.parametrize('texts, dtype', [(BMP_LIST, 'uint16'), (ASTRAL_LIST, 'uint32')], ids=['bmp', 'astral'])
+def test_round_trip(tmp_path, texts, dtype):
+    __packed = export_and_load(texts=texts, path=str(tmp_path / 'shard'))
+    assert __packed['meta']['dtype'] == dtype
+    assert __packed['meta']['count'] == len(texts)
+    # one codepoint per character, whatever the encoding
+    assert __packed['meta']['length'] == sum(len(__t) for __t in texts)
+    assert [scrapscii.data.decode_codepoints(__packed, index=__i) for __i in range(len(texts))] == texts
+    assert [scrapscii.data.shape_codepoints(__packed, index=__i) for __i in range(len(texts))] == [(len(__t),) for __t in texts]
+
+def test_round_trip_empty(tmp_path):
+    __packed = export_and_load(texts=[], path=str(tmp_path / 'shard'))
+    assert __packed['meta']['count'] == 0
+    assert __packed['meta']['length'] == 0
+    assert len(__packed['data']) == 0
+    assert list(__packed['offsets']) == [0]
+
+@pytest.mark.parametrize('texts', [BMP_LIST, ASTRAL_LIST], ids=['bmp', 'astral'])
+def test_round_trip_grid(tmp_path, texts):
+    __packed = export_and_load(texts=texts, path=str(tmp_path / 'shard'), grid=True)
+    assert __packed['meta']['pad'] == scrapscii.data.PAD
+    for __i, __t in enumerate(texts):
+        __lines = __t.split('\n')
+        __height, __width = scrapscii.data.shape_codepoints(__packed, index=__i)
+        assert (__height, __width) == (len(__lines), max(len(__l) for __l in __lines))
+        # the rows are padded to the same width, the padding is stripped back
+        __content = scrapscii.data.decode_codepoints(__packed, index=__i)
+        assert len(__content) == __height * __width
+        assert [__content[__r * __width:(__r + 1) * __width].rstrip(scrapscii.data.PAD) for __r in range(__height)] == [__l.rstrip(scrapscii.data.PAD) for __l in __lines]
@@ -0,0 +1,23 @@
+import art
+import pytest
+
+import scrapscii.glyphs
+
+# FIXTURES #####################################################################
+
+FONT_LIST = ['standard', 'block', 'banner3', '3d_diagonal', 'tarty1', 'mirror', 'fancy1', 'small']
+DECORATION_LIST = [None, 'barcode1', 'heart1', 'no']
+SPACING_LIST = [0, 1, 3]
+TEXT_LIST = ['Hello', 'ASCII art!', 'two\nlines', 'Zz 09 ?']
+
+# RENDERING ####################################################################
+
+@pytest.mark.parametrize('font', FONT_LIST)
+@pytest.mark.parametrize('decoration', DECORATION_LIST)
+@pytest.mark.parametrize('space', SPACING_LIST)
+def test_text2art_matches_art(font, decoration, space):
+    for __t in TEXT_LIST:
+        assert scrapscii.glyphs.text2art(__t, font=font, decoration=decoration, space=space) == art.text2art(__t, font=font, decoration=decoration, space=space, chr_ignore=True)
+
+def test_verify_font_reports_no_errors():
+    assert scrapscii.glyphs.verify_font(font='standard', texts=TEXT_LIST, decorations=DECORATION_LIST, spacings=SPACING_LIST) == []
@@ -0,0 +1,70 @@
+import os
+
+import pyarrow.parquet as pq
+
+import scrapscii.data
+import scrapscii.index
+
+# FIXTURES #####################################################################
+
+def make_rows(contents: list) -> list:
+    return [{'caption': '', 'content': __c, 'labels': '', 'charsets': '', 'chartypes': ''} for __c in contents]
+
+def read_contents(path: str) -> list:
+    return pq.read_table(path, columns=['content']).column('content').to_pylist()
+
+# ROUND TRIP ###################################################################
+
+def test_insert_and_load(tmp_path):
+    __index = scrapscii.index.init_index(path=str(tmp_path / 'contents.index'))
+    __key = scrapscii.index.hash_content('/\\_/\\')
+    scrapscii.index.insert(__index, entries=[(__key, str(tmp_path / 'data' / '0000.parquet'), 0, 3)])
+    # the paths are stored relative to the index, and resolved on load
+    __loaded = scrapscii.index.load_index(path=__index['path'])
+    assert scrapscii.index.lookup(__loaded, key=__key) == (os.path.realpath(str(tmp_path / 'data' / '0000.parquet')), 0, 3)
+
+def test_export_drops_the_indexed_duplicates(tmp_path):
+    __index = scrapscii.index.init_index(path=str(tmp_path / 'contents.index'))
+    __first, __second = str(tmp_path / '0000.parquet'), str(tmp_path / '0001.parquet')
+    scrapscii.data.export_table_as_parquet(table=make_rows(['a', 'b', 'a']), path=__first, index=__index)
+    assert read_contents(__first) == ['a', 'b']
+    # the duplicates are found across files and across runs
+    __index = scrapscii.index.load_index(path=__index['path'])
+    scrapscii.data.export_table_as_parquet(table=make_rows(['b', 'c']), path=__second, index=__index)
+    assert read_contents(__second) == ['c']
+    # the index points at the actual rows
+    __path, __group, __row = scrapscii.index.lookup(__index, key=scrapscii.index.hash_content('c'))
+    assert pq.ParquetFile(__path).read_row_group(__group).column('content')[__row].as_py() == 'c'
+
+def test_export_replaces_the_rows_of_a_rewritten_file(tmp_path):
+    __index = scrapscii.index.init_index(path=str(tmp_path / 'contents.index'))
+    __path = str(tmp_path / '0000.parquet')
+    scrapscii.data.export_table_as_parquet(table=make_rows(['a', 'b']), path=__path, index=__index)
+    # the previous rows of the same file are not duplicates of the new ones
+    scrapscii.data.export_table_as_parquet(table=make_rows(['b', 'c']), path=__path, index=__index)
+    assert read_contents(__path) == ['b', 'c']
+    __loaded = scrapscii.index.load_index(path=__index['path'])
+    assert not scrapscii.index.contains(__loaded, key=scrapscii.index.hash_content('a'))
+    assert scrapscii.index.lookup(__loaded, key=scrapscii.index.hash_content('c'))[1:] == (0, 1)
+
+# REMOVE #######################################################################
+
+def test_remove_file_skips_the_missing_files(tmp_path):
+    __index = scrapscii.index.init_index(path=str(tmp_path / 'contents.index'))
+    __path = str(tmp_path / '0000.parquet')
+    scrapscii.index.insert(__index, entries=[('k', __path, 0, 0)])
+    assert scrapscii.index.remove_file(__index, path=__path) == 0
+    assert scrapscii.index.contains(__index, key='k')
+
+def test_remove_file_keeps_the_concurrent_lines(tmp_path):
+    __path = str(tmp_path / '0000.parquet')
+    open(__path, 'wb').close()
+    __index = scrapscii.index.init_index(path=str(tmp_path / 'contents.index'))
+    scrapscii.index.insert(__index, entries=[('old', __path, 0, 0)])
+    # another worker appends to the same index after it was loaded here
+    __other = scrapscii.index.load_index(path=__index['path'])
+    scrapscii.index.insert(__other, entries=[('new', str(tmp_path / '0001.parquet'), 0, 0)])
+    assert scrapscii.index.remove_file(__index, path=__path) == 1
+    __loaded = scrapscii.index.load_index(path=__index['path'])
+    assert scrapscii.index.contains(__loaded, key='new')
+    assert not scrapscii.index.contains(__loaded, key='old')
@@ -0,0 +1,44 @@
+import numpy as np
+
+import scrapscii.minhash
+
+# FIXTURES #####################################################################
+
+def make_signatures() -> dict:
+    __rows = scrapscii.minhash.PERMUTATION_LEN // scrapscii.minhash.BAND_LEN
+    __first = np.arange(scrapscii.minhash.PERMUTATION_LEN, dtype=np.uint32) + 1000
+    # shares the first band with the first row, and nothing else
+    __second = np.arange(scrapscii.minhash.PERMUTATION_LEN, dtype=np.uint32) + 2000
+    __second[:__rows] = __first[:__rows]
+    # similar to the second row, but one value differs in every other band
+    __third = __second.copy()
+    __third[__rows::__rows] += 5000
+    return {'first': __first, 'second': __second, 'third': __third}
+
+def insert_all(monkeypatch, texts: list) -> dict:
+    __signatures = make_signatures()
+    # the signatures are chosen, the shingles are irrelevant here
+    monkeypatch.setattr(scrapscii.minhash, 'shingle_content', lambda text: text)
+    monkeypatch.setattr(scrapscii.minhash, 'compute_signature', lambda shingles, permutations: __signatures[shingles])
+    __index = scrapscii.minhash.init_index()
+    for __t in texts:
+        scrapscii.minhash.insert(__index, text=__t, key=__t)
+    return __index
+
+# CLUSTER ######################################################################
+
+def test_insert_checks_every_member_of_the_bucket(monkeypatch):
+    __signatures = make_signatures()
+    assert scrapscii.minhash.similarity(__signatures['second'], __signatures['third']) >= scrapscii.minhash.THRESHOLD
+    assert scrapscii.minhash.similarity(__signatures['first'], __signatures['third']) < scrapscii.minhash.THRESHOLD
+    # the only band shared by the near duplicates was filled by an unrelated row first
+    __index = insert_all(monkeypatch, texts=['first', 'second', 'third'])
+    assert scrapscii.minhash.cluster(__index) == [['second', 'third']]
+
+def test_insert_finds_the_near_duplicates():
+    __art = '\n'.join(' /\\_/\\  ' + str(__i) * 8 for __i in range(8))
+    __index = scrapscii.minhash.init_index()
+    scrapscii.minhash.insert(__index, text=__art, key='original')
+    scrapscii.minhash.insert(__index, text=__art.replace('7', '8', 1), key='edited')
+    scrapscii.minhash.insert(__index, text='something else entirely\n' * 4, key='other')
+    assert scrapscii.minhash.cluster(__index) == [['original', 'edited']]
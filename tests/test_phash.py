@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+import scrapscii.phash
+
+# FIXTURES #####################################################################
+
+VALUE = random.Random(1337).getrandbits(scrapscii.phash.HASH_BITS)
+
+def flip_bits(value: int, count: int, step: int=13) -> int:
+    # spread the flips over the pieces, the worst case for the pigeonhole lookup
+    for __i in range(count):
+        value ^= 1 << ((__i * step) % scrapscii.phash.HASH_BITS)
+    return value
+
+@pytest.fixture
+def index():
+    __index = scrapscii.phash.init_index()
+    scrapscii.phash.insert(__index, value=VALUE, key=1)
+    return __index
+
+# SEARCH #######################################################################
+
+@pytest.mark.parametrize('distance', range(scrapscii.phash.DISTANCE_MAX + 1))
+def test_search_finds_within_distance(index, distance):
+    assert scrapscii.phash.search(index, value=flip_bits(VALUE, distance), key=2) == (VALUE, 1)
+
+def test_search_ignores_beyond_distance(index):
+    assert scrapscii.phash.search(index, value=flip_bits(VALUE, scrapscii.phash.DISTANCE_MAX + 1), key=2) == ()
+    # contiguous flips, so that some pieces are shared but the distance is too large
+    assert scrapscii.phash.search(index, value=flip_bits(VALUE, scrapscii.phash.DISTANCE_MAX + 1, step=1), key=2) == ()
+
+def test_search_exempts_the_same_source(index):
+    assert scrapscii.phash.search(index, value=VALUE, key=1) == ()
+    assert scrapscii.phash.check_hash(index, value=VALUE, key=1) == ''
+
+# REGISTER #####################################################################
+
+def test_check_hash_does_not_register():
+    __index = scrapscii.phash.init_index()
+    # an image that gave no rows must not hide its copies
+    assert scrapscii.phash.check_hash(__index, value=VALUE, key=1) == ''
+    assert scrapscii.phash.check_hash(__index, value=VALUE, key=2) == ''
+    scrapscii.phash.register_hash(__index, value=VALUE, key=1)
+    assert scrapscii.phash.check_hash(__index, value=VALUE, key=2) == 'duplicate'
+
+def test_register_hash_persists_once(tmp_path):
+    __path = str(tmp_path / 'images.phash')
+    __index = scrapscii.phash.init_index()
+    scrapscii.phash.register_hash(__index, value=VALUE, key=1, path=__path)
+    scrapscii.phash.register_hash(__index, value=VALUE, key=1, path=__path)
+    assert scrapscii.phash.load_index(__path)['count'] == 1
+
+def test_check_hash_rejects_undecoded():
+    assert scrapscii.phash.check_hash(scrapscii.phash.init_index(), value=scrapscii.phash.hash_image(data=b'junk')) == 'decode'
@@ -0,0 +1,81 @@
+import hashlib
+
+import pyarrow.parquet as pq
+import pytest
+
+import scrapscii.cli
+
+stylize = scrapscii.cli.load_script('stylize')
+
+# FIXTURES #####################################################################
+
+SAMPLE_LEN = 40
+CHECKPOINT_LEN = 8
+CRASH_AT = 2 * CHECKPOINT_LEN # right after the second checkpoint
+
+DATASET = [{'url.txt': 'https://example.com/{index}.png'.format(index=__i), 'syn.json': {'syn_text': ['caption']}} for __i in range(SAMPLE_LEN)]
+
+class Interrupted(Exception):
+    pass
+
+def render_url(path: str, options: list=[], timeout: float=0) -> str:
+    # the content identifies the sample, padded beyond the minimum width
+    return path.ljust(2 * stylize.WIDTH_MAX, '#')
+
+@pytest.fixture
+def fetched(monkeypatch):
+    __fetched = []
+    def __fetch(url: str, **kwargs) -> tuple:
+        # the run stops while pulling the next sample, as if it was killed
+        if len(__fetched) == CRASH_AT and not __fetched.count('crash'):
+            __fetched.append('crash')
+            raise Interrupted()
+        __fetched.append(url)
+        return (url, '', False)
+    # no network and no rendering, every sample gives exactly one row
+    monkeypatch.setattr(stylize, 'fetch_image', __fetch)
+    monkeypatch.setattr(stylize.scrapscii.phash, 'hash_image', lambda path='', data=b'': int.from_bytes(hashlib.blake2b(path.encode('utf-8'), digest_size=8).digest(), 'big'))
+    monkeypatch.setattr(stylize.scrapscii.images, 'convert_image', render_url)
+    return __fetched
+
+def run(dataset: iter, path: str) -> tuple:
+    __progress_path = str(path / 'progress.json')
+    __progress = stylize.load_progress(__progress_path)
+    __stats = stylize.init_stats(data=__progress['stats'])
+    __dataset = stylize.resume_dataset(dataset, progress=__progress)
+    return stylize.convert_shard(
+        dataset=__dataset,
+        table=__progress['table'],
+        stats=__stats,
+        table_len=12, # not a multiple of the checkpoints, so rows are buffered at the crash
+        shard_len=SAMPLE_LEN,
+        variant_len=1,
+        data_path=str(path),
+        source=__dataset,
+        phash_path='',
+        checkpoint_len=CHECKPOINT_LEN,
+        progress_path=__progress_path,
+        metrics_path=str(path / 'metrics.json'),
+        prometheus_path=str(path / 'metrics.prom'),)
+
+# RESUME #######################################################################
+
+@pytest.mark.parametrize('dataset', [lambda: DATASET, lambda: iter(DATASET)], ids=['list', 'iterator'])
+def test_resume_after_interruption(tmp_path, fetched, dataset):
+    # each run opens the stream again, from the start
+    with pytest.raises(Interrupted):
+        run(dataset=dataset(), path=tmp_path)
+    # the rows of the samples after the last export are only in the progress file
+    assert stylize.load_progress(str(tmp_path / 'progress.json'))['table']
+    __stats, __table = run(dataset=dataset(), path=tmp_path)
+    # every sample is processed exactly once
+    __urls = [__u for __u in fetched if __u != 'crash']
+    assert __urls == [__s['url.txt'] for __s in DATASET]
+    assert __stats['counters']['samples'] == SAMPLE_LEN
+    # and its row is either in a shard or in the remainder
+    __contents = [
+        __c
+        for __p in sorted(tmp_path.glob('*.parquet'))
+        for __c in pq.read_table(str(__p), columns=['content']).column('content').to_pylist()]
+    __contents += [__r['content'] for __r in __table]
+    assert [__c.rstrip('#') for __c in __contents] == __urls